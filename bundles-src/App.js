@@ -62,6 +62,15 @@ class App extends Component {
 
     let csrfToken = document.querySelector("[name=csrfmiddlewaretoken]").value;
 
+    // Повторная отправка того же заказа идёт с тем же ключом, чтобы сервер не создал дубль
+    let body = JSON.stringify(data);
+    if (!this.pendingCheckout || this.pendingCheckout.body !== body){
+      this.pendingCheckout = {
+        body,
+        idempotencyKey: `${Date.now()}-${Math.random().toString(36).slice(2)}`,
+      };
+    }
+
     try {
       let response = await fetch(url, {
         method: 'post',
@@ -69,8 +78,9 @@ class App extends Component {
           'Accept': 'application/json',
           'Content-Type': 'application/json',
           'X-CSRFToken': csrfToken,
+          'Idempotency-Key': this.pendingCheckout.idempotencyKey,
         },
-        body: JSON.stringify(data),
+        body,
       });
 
       if (!response.ok){
@@ -79,6 +89,7 @@ class App extends Component {
       }
       let responseData = await response.json();
 
+      this.pendingCheckout = null;
       this.setState({
         cart: [],
       });
@@ -101,45 +112,73 @@ class App extends Component {
   }
 
 
-  async getProducts(){
-    let response = await fetch('/api/products/', {
-      headers: {
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-      }
-    });
+  async fetchJSON(url, etag){
+    let headers = {
+      'Accept': 'application/json',
+      'Content-Type': 'application/json',
+    };
+    if (etag){
+      headers['If-None-Match'] = etag;
+    }
+    let response = await fetch(url, {headers});
 
+    // 304 — данные на странице всё ещё актуальны
     if (!response.ok){
-      return;
+      return null;
     }
-
-    let data = await response.json();
-    this.setState({
-      products : data
-    });
+    return response.json();
   }
 
-  async getBanners(){
-    let response = await fetch('/api/banners/', {
-      headers: {
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-      }
-    });
+  async getProducts(etag){
+    let data = await this.fetchJSON('/api/products/', etag);
+    if (data){
+      this.setState({
+        products : data
+      });
+    }
+  }
 
-    if (!response.ok){
-      return;
+  async getBanners(etag){
+    let data = await this.fetchJSON('/api/banners/', etag);
+    if (data){
+      this.setState({
+        banners : data
+      });
     }
+  }
 
-    let data = await response.json();
-    this.setState({
-      banners : data
-    });
+  readBootstrapData(){
+    let element = document.getElementById('bootstrap-data');
+    if (!element){
+      return null;
+    }
+    try {
+      return JSON.parse(element.textContent);
+    } catch(error){
+      return null;
+    }
   }
 
   componentDidMount(){
-    this.getProducts();
-    this.getBanners();
+    // Каталог и баннеры приходят вместе со страницей, API нужен только без них
+    let bootstrap = this.readBootstrapData();
+    if (bootstrap){
+      this.setState({
+        products: bootstrap.products,
+        banners: bootstrap.banners,
+      });
+    } else {
+      this.getProducts();
+      this.getBanners();
+    }
+
+    // Страница, восстановленная из кэша истории, могла устареть — перепроверяем
+    window.addEventListener('pageshow', event => {
+      if (event.persisted){
+        this.getProducts(bootstrap && bootstrap.products_etag);
+        this.getBanners(bootstrap && bootstrap.banners_etag);
+      }
+    });
   }
 
 
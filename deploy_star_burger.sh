@@ -18,9 +18,15 @@ source venv/bin/activate
 echo -e "Installing Python dependencies..."
 pip install -r requirements.txt
 
+echo -e "Checking production settings..."
+python manage.py check --deploy --fail-level ERROR
+
 echo -e "Running database migrations..."
 python manage.py migrate --noinput
 
+echo -e "Warming geocoder cache..."
+python manage.py warm_geocoder_cache
+
 echo -e "Collecting static files..."
 python manage.py collectstatic --noinput --clear
 
@@ -28,6 +34,10 @@ python manage.py collectstatic --noinput --clear
 echo -e "Installing Node.js dependencies..."
 npm ci --dev
 
+if ! grep -q '^CLIENT_IP_META_KEY=' .env; then
+  echo "Warning: CLIENT_IP_META_KEY is not set in .env, API requests are not rate limited per client IP"
+fi
+
 echo -e "Restarting services..."
 sudo systemctl restart starburger
 sudo systemctl reload nginx
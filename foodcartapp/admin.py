@@ -1,27 +1,72 @@
 from django.contrib import admin
 from django.shortcuts import reverse
-from django.templatetags.static import static
 from django.utils.html import format_html
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.utils.http import url_has_allowed_host_and_scheme
 from django import forms
 
+from geocoder_cache.utils import get_cached_coordinates
 
+from .exports import EXPORT_FORMATS
+from .images import generate_image_variants
+from .models import Banner
 from .models import Product
 from .models import ProductCategory
 from .models import Restaurant
 from .models import RestaurantMenuItem
 from .models import Order
 from .models import OrderItem
+from .models import PendingOrder
+from .paginators import EstimatedCountPaginator
+from .search import search
+
+
+class PrefixAutocompleteMixin:
+    """
+    Поиск для виджетов autocomplete_fields по началу названия.
+
+    Такой поиск идёт по индексу, а обычный поиск в списке объектов
+    остаётся прежним.
+    """
+    autocomplete_search_fields = ['^name']
+    autocomplete_ordering = ['name']
+
+    def is_autocomplete_request(self, request):
+        return request.resolver_match is not None and request.resolver_match.url_name == 'autocomplete'
+
+    def get_search_fields(self, request):
+        if self.is_autocomplete_request(request):
+            return self.autocomplete_search_fields
+        return super().get_search_fields(request)
+
+    def get_ordering(self, request):
+        if self.is_autocomplete_request(request):
+            return self.autocomplete_ordering
+        return super().get_ordering(request)
+
+
+class IndexedSearchMixin:
+    """Поиск по search_fields через foodcartapp.search, а не через icontains Django"""
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = self.get_search_fields(request)
+        # Поля с префиксами = и @ ищутся по-своему, их оставляем Django
+        if not search_term or any(field[0] in '=@' for field in search_fields):
+            return super().get_search_results(request, queryset, search_term)
+        return search(queryset, search_fields, search_term), False
 
 
 class RestaurantMenuItemInline(admin.TabularInline):
     model = RestaurantMenuItem
     extra = 0
+    autocomplete_fields = [
+        'restaurant',
+        'product',
+    ]
 
 
 @admin.register(Restaurant)
-class RestaurantAdmin(admin.ModelAdmin):
+class RestaurantAdmin(PrefixAutocompleteMixin, IndexedSearchMixin, admin.ModelAdmin):
     search_fields = [
         'name',
         'address',
@@ -35,10 +80,19 @@ class RestaurantAdmin(admin.ModelAdmin):
     inlines = [
         RestaurantMenuItemInline
     ]
+    readonly_fields = [
+        'lat',
+        'lon',
+    ]
+
+    def save_model(self, request, obj, form, change):
+        if not change or 'address' in form.changed_data:
+            obj.lat, obj.lon = get_cached_coordinates(obj.address)
+        super().save_model(request, obj, form, change)
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(PrefixAutocompleteMixin, IndexedSearchMixin, admin.ModelAdmin):
     list_display = [
         'get_image_list_preview',
         'name',
@@ -52,8 +106,6 @@ class ProductAdmin(admin.ModelAdmin):
         'category',
     ]
     search_fields = [
-        # FIXME SQLite can not convert letter case for cyrillic words properly, so search will be buggy.
-        # Migration to PostgreSQL is necessary
         'name',
         'category__name',
     ]
@@ -89,7 +141,7 @@ class ProductAdmin(admin.ModelAdmin):
     class Media:
         css = {
             "all": (
-                static("admin/foodcartapp.css")
+                "admin/foodcartapp.css",
             )
         }
 
@@ -103,7 +155,39 @@ class ProductAdmin(admin.ModelAdmin):
         if not obj.image or not obj.id:
             return 'нет картинки'
         edit_url = reverse('admin:foodcartapp_product_change', args=(obj.id,))
-        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=obj.image.url)
+        return format_html(
+            '<a href="{edit_url}"><img src="{src}" srcset="{srcset}" sizes="100px" style="max-height: 50px;"/></a>',
+            edit_url=edit_url, src=obj.thumbnail_url, srcset=obj.thumbnail_srcset,
+        )
+    get_image_list_preview.short_description = 'превью'
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if obj.image and not obj.has_actual_image_variants():
+            obj.image_variants = generate_image_variants(obj.image)
+            obj.save(update_fields=['image_variants'])
+
+
+@admin.register(Banner)
+class BannerAdmin(admin.ModelAdmin):
+    list_display = [
+        'get_image_list_preview',
+        'title',
+        'position',
+        'active_from',
+        'active_to',
+    ]
+    list_display_links = [
+        'title',
+    ]
+    list_editable = [
+        'position',
+    ]
+
+    def get_image_list_preview(self, obj):
+        if not obj.image:
+            return 'нет картинки'
+        return format_html('<img src="{src}" style="max-height: 50px;"/>', src=obj.image.url)
     get_image_list_preview.short_description = 'превью'
 
 
@@ -111,6 +195,7 @@ class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 1
     readonly_fields = ['price']
+    autocomplete_fields = ['product']
 
 
 class OrderAdminForm(forms.ModelForm):
@@ -121,38 +206,71 @@ class OrderAdminForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if self.instance and self.instance.pk:
-            order_products = [item.product for item in self.instance.order_items.all()]
-
-            if not order_products:
-                self.fields['cooking_restaurant'].queryset = Restaurant.objects.none()
-                return
-
-            suitable_restaurants = set()
-            first_product = True
-
-            for product in order_products:
-                restaurants_for_product = set(
-                    RestaurantMenuItem.objects.filter(
-                        product=product,
-                        availability=True
-                    ).values_list('restaurant', flat=True)
-                )
-
-                if first_product:
-                    suitable_restaurants = restaurants_for_product
-                    first_product = False
-                else:
-                    suitable_restaurants &= restaurants_for_product
-
-            self.fields['cooking_restaurant'].queryset = Restaurant.objects.filter(
-                id__in=suitable_restaurants
+            self.fields['cooking_restaurant'].queryset = Restaurant.objects.able_to_cook(
+                [self.instance.pk]
             )
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(IndexedSearchMixin, admin.ModelAdmin):
     form = OrderAdminForm
     inlines = [OrderItemInline]
+    list_display = [
+        'id',
+        'registered_at',
+        'status',
+        'payment_method',
+        'firstname',
+        'lastname',
+        'phonenumber',
+        'address',
+        'cooking_restaurant',
+        'get_total_price',
+    ]
+    list_filter = [
+        'status',
+        'payment_method',
+    ]
+    search_fields = [
+        'lastname',
+        'phonenumber',
+        'address',
+    ]
+    list_select_related = [
+        'cooking_restaurant',
+    ]
+    list_per_page = 50
+    ordering = [
+        '-registered_at',
+        '-id',
+    ]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [
+        'export_csv',
+        'export_ndjson',
+    ]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).total_price()
+
+    def get_total_price(self, obj):
+        return obj.total_price
+    get_total_price.short_description = 'стоимость заказа'
+
+    def export_orders(self, queryset, export_format):
+        iter_export, content_type = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(iter_export(queryset), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="orders.{export_format}"'
+        return response
+
+    def export_csv(self, request, queryset):
+        return self.export_orders(queryset, 'csv')
+    export_csv.short_description = 'Выгрузить в CSV'
+
+    def export_ndjson(self, request, queryset):
+        return self.export_orders(queryset, 'ndjson')
+    export_ndjson.short_description = 'Выгрузить в NDJSON'
 
     def save_formset(self, request, form, formset, change):
         instances = formset.save(commit=False)
@@ -179,5 +297,24 @@ class OrderAdmin(admin.ModelAdmin):
 
 
 @admin.register(ProductCategory)
-class ProductAdmin(admin.ModelAdmin):
-    pass
+class ProductAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    search_fields = [
+        'name',
+    ]
+
+
+@admin.register(PendingOrder)
+class PendingOrderAdmin(admin.ModelAdmin):
+    list_display = [
+        'reference',
+        'created_at',
+        'failure_reason',
+    ]
+    list_filter = [
+        ('failure_reason', admin.EmptyFieldListFilter),
+    ]
+    readonly_fields = [
+        'reference',
+        'payload',
+        'created_at',
+    ]
@@ -0,0 +1,50 @@
+from hashlib import md5
+
+from django.core.cache import cache
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import Banner
+from .rendering import dumps
+
+
+BANNERS_CACHE_KEY = 'foodcartapp:banners:v2'
+BANNERS_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def get_banners_payload():
+    """
+    Возвращает (json, etag) для активных баннеров.
+
+    Кэш живёт не дольше, чем до ближайшего начала или конца показа
+    какого-нибудь баннера, а при изменении баннеров сбрасывается сигналом.
+    """
+    cached = cache.get(BANNERS_CACHE_KEY)
+    if cached is not None:
+        return cached
+
+    now = timezone.now()
+    payload = dumps([
+        {
+            'title': banner.title,
+            'src': banner.image.url,
+            'text': banner.text,
+        }
+        for banner in Banner.objects.active(now)
+    ])
+    cached = (payload, md5(payload).hexdigest())
+
+    upcoming_changes = Banner.objects.aggregate(
+        next_start=Min('active_from', filter=Q(active_from__gt=now)),
+        next_end=Min('active_to', filter=Q(active_to__gt=now)),
+    )
+    timeout = BANNERS_CACHE_TIMEOUT
+    for moment in upcoming_changes.values():
+        if moment is not None:
+            timeout = min(timeout, int((moment - now).total_seconds()) + 1)
+    cache.set(BANNERS_CACHE_KEY, cached, timeout)
+    return cached
+
+
+def invalidate_banners():
+    cache.delete(BANNERS_CACHE_KEY)
@@ -0,0 +1,42 @@
+from django.utils.http import quote_etag
+from django.utils.safestring import mark_safe
+
+from .banners import get_banners_payload
+from .catalog import get_catalog_payload, get_catalog_version, get_variant_key
+from .rendering import dumps
+
+
+# Те же замены, что делает фильтр json_script: готовый JSON нельзя
+# оборвать закрывающим </script> или комментарием <!--
+SCRIPT_ESCAPES = {
+    ord('>'): '\\u003E',
+    ord('<'): '\\u003C',
+    ord('&'): '\\u0026',
+}
+
+
+def escape_for_script(payload):
+    return payload.decode().translate(SCRIPT_ESCAPES)
+
+
+def get_bootstrap_json():
+    """
+    Собирает данные для первой отрисовки витрины: каталог и баннеры.
+
+    JSON берётся из тех же кэшей, что отдают /api/products/ и /api/banners/,
+    и склеивается без повторной сериализации. ETag'и совпадают с ответами
+    API, чтобы клиент мог перепроверить данные условным запросом.
+    """
+    version = get_catalog_version()
+    products_payload = get_catalog_payload(version)
+    banners_payload, banners_etag = get_banners_payload()
+
+    products_etag = quote_etag(f'{version}-{get_variant_key({})}')
+    return mark_safe(
+        '{"products":%s,"products_etag":%s,"banners":%s,"banners_etag":%s}' % (
+            escape_for_script(products_payload),
+            escape_for_script(dumps(products_etag)),
+            escape_for_script(banners_payload),
+            escape_for_script(dumps(quote_etag(banners_etag))),
+        )
+    )
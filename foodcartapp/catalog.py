@@ -0,0 +1,111 @@
+from hashlib import md5
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from .models import Product
+from .rendering import dumps
+
+
+CATALOG_VERSION_CACHE_KEY = 'foodcartapp:catalog_version'
+CATALOG_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(CATALOG_VERSION_CACHE_KEY, version, None):
+            version = cache.get(CATALOG_VERSION_CACHE_KEY, version)
+    return version
+
+
+def bump_catalog_version():
+    cache.set(CATALOG_VERSION_CACHE_KEY, uuid4().hex, None)
+
+
+def serialize_category(category):
+    if not category:
+        return None
+    return {
+        'id': category.id,
+        'name': category.name,
+    }
+
+
+PRODUCT_FIELD_GETTERS = {
+    'id': lambda product: product.id,
+    'name': lambda product: product.name,
+    'price': lambda product: product.price,
+    'special_status': lambda product: product.special_status,
+    'description': lambda product: product.description,
+    'category': lambda product: serialize_category(product.category),
+    'image': lambda product: product.image.url,
+    'image_srcset': lambda product: product.get_image_srcset(),
+    'restaurant': lambda product: {
+        'id': product.id,
+        'name': product.name,
+    },
+}
+CATALOG_FIELDS = list(PRODUCT_FIELD_GETTERS)
+
+
+def serialize_product(product, fields=None):
+    return {
+        field: PRODUCT_FIELD_GETTERS[field](product)
+        for field in fields or CATALOG_FIELDS
+    }
+
+
+def get_variant_key(params):
+    if not params:
+        return 'all'
+    return md5(dumps(params, sort_keys=True)).hexdigest()
+
+
+def get_catalog_payload(version, params=None):
+    """
+    Возвращает готовый JSON каталога для версии version.
+
+    Каталог собирается один раз на версию и набор параметров params
+    (category, special, fields, cursor, limit); версия меняется при любом
+    изменении товаров, категорий или меню ресторанов. Без limit
+    возвращается список товаров, с limit — страница
+    {"results": [...], "next_cursor": ...}.
+    """
+    params = params or {}
+    cache_key = f'foodcartapp:catalog:{version}:{get_variant_key(params)}'
+    payload = cache.get(cache_key)
+    if payload is None:
+        payload = dumps(build_catalog(**params))
+        cache.set(cache_key, payload, CATALOG_CACHE_TIMEOUT)
+    return payload
+
+
+def build_catalog(category=None, special=None, fields=None, cursor=None, limit=None):
+    products = Product.objects.available().order_by('id')
+    if not fields or 'category' in fields:
+        products = products.select_related('category')
+    if category is not None:
+        products = products.filter(category_id=category)
+    if special is not None:
+        products = products.filter(special_status=special)
+    if cursor is not None:
+        products = products.filter(id__gt=cursor)
+    if limit is not None:
+        products = products[:limit + 1]
+
+    products = list(products)
+    next_cursor = None
+    if limit is not None and len(products) > limit:
+        products = products[:limit]
+        next_cursor = products[-1].id
+
+    dumped_products = [serialize_product(product, fields) for product in products]
+
+    if limit is None:
+        return dumped_products
+    return {
+        'results': dumped_products,
+        'next_cursor': next_cursor,
+    }
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Версия каталога, баннеры, лимиты запросов и счётчик запросов в работе
+    живут в кэше и должны быть общими для всех воркеров gunicorn.
+    """
+    if settings.DEBUG:
+        return []
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in LOCAL_CACHE_BACKENDS:
+        return []
+    return [
+        Error(
+            'Кэш по умолчанию не общий для процессов сайта',
+            hint='Укажите CACHE_URL, например redis://127.0.0.1:6379/1',
+            obj=backend,
+            id='foodcartapp.E001',
+        ),
+    ]
@@ -0,0 +1,61 @@
+import os
+from hashlib import md5
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image
+
+
+IMAGE_VARIANT_WIDTHS = [64, 256, 768]
+IMAGE_VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def generate_image_variants(image):
+    """
+    Создаёт уменьшенные копии картинки в WebP и JPEG и кладёт их рядом с оригиналом.
+
+    Картинка не увеличивается: ширины не меньше исходной пропускаются, а
+    самой широкой копией становится картинка в исходном размере. Имена
+    файлов содержат хэш оригинала, поэтому их можно кэшировать навсегда.
+    Возвращает словарь для Product.image_variants.
+    """
+    with image.open('rb') as source:
+        content = source.read()
+    content_hash = md5(content).hexdigest()[:12]
+    stem = os.path.splitext(image.name)[0]
+
+    original = Image.open(BytesIO(content))
+    original.load()
+
+    widths = [width for width in IMAGE_VARIANT_WIDTHS if width < original.width]
+    if original.width <= IMAGE_VARIANT_WIDTHS[-1]:
+        # Иначе самой широкой копией станет меньшая ширина из списка, и браузер растянет её
+        widths.append(original.width)
+    variants = []
+    for width in widths:
+        resized = original.copy()
+        resized.thumbnail((width, width * 10))
+        if variants and variants[-1]['width'] == resized.width:
+            continue
+        if resized.mode not in ('RGB', 'RGBA'):
+            resized = resized.convert('RGBA' if 'transparency' in resized.info else 'RGB')
+
+        # Ширину берём у готовой картинки: для srcset нужна настоящая
+        variant = {'width': resized.width}
+        for extension, (image_format, save_options) in IMAGE_VARIANT_FORMATS.items():
+            name = f'{stem}.{content_hash}.{resized.width}w.{extension}'
+            if not image.storage.exists(name):
+                converted = resized.convert('RGB') if image_format == 'JPEG' else resized
+                buffer = BytesIO()
+                converted.save(buffer, image_format, **save_options)
+                name = image.storage.save(name, ContentFile(buffer.getvalue()))
+            variant[extension] = name
+        variants.append(variant)
+
+    return {
+        'source': image.name,
+        'variants': variants,
+    }
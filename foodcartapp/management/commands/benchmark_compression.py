@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from foodcartapp.views import banners_list_api, product_list_api, start_page
+from star_burger.compression import compress_content
+
+
+PAGES = {
+    '/': start_page,
+    '/api/products/': product_list_api,
+    '/api/banners/': banners_list_api,
+}
+ENCODINGS = [
+    ('gzip', False),
+    ('gzip', True),
+    ('br', False),
+]
+
+
+def measure(func, repeat):
+    timings = []
+    for __ in range(repeat):
+        started_at = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    help = 'Показывает, сколько байт экономит сжатие ответов CompressionMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        request_factory = RequestFactory()
+        for path, view in PAGES.items():
+            content = view(request_factory.get(path)).content
+            self.stdout.write(f'{path}: {len(content) / 1024:.1f} КБ без сжатия')
+            if not content:
+                continue
+            for encoding, padded in ENCODINGS:
+                elapsed, compressed_content = measure(
+                    lambda: compress_content(content, encoding, padded),
+                    options['repeat'],
+                )
+                title = f'{encoding} со случайной добавкой' if padded else encoding
+                self.stdout.write(
+                    f'  {title}: {len(compressed_content) / 1024:.1f} КБ '
+                    f'({len(compressed_content) / len(content):.0%}), {elapsed * 1000:.2f} мс'
+                )
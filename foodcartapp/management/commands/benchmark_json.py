@@ -0,0 +1,64 @@
+import json
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from foodcartapp.rendering import dumps
+
+
+def get_catalog(size):
+    """Данные того же вида, что отдаёт /api/products/"""
+    return [
+        {
+            'id': number,
+            'name': f'Бургер №{number}',
+            'price': Decimal('349.00') + number,
+            'special_status': number % 5 == 0,
+            'description': 'Сочная котлета, свежие овощи и фирменный соус. ' * 3,
+            'category': {'id': number % 7, 'name': 'Бургеры'},
+            'image': f'/media/burger-{number}.png',
+            'image_srcset': {
+                extension: ', '.join(
+                    f'/media/burger-{number}.0123456789ab.{width}w.{extension} {width}w'
+                    for width in (64, 256, 768)
+                )
+                for extension in ('webp', 'jpeg')
+            },
+            'restaurant': {'id': number, 'name': f'Бургер №{number}'},
+        }
+        for number in range(size)
+    ]
+
+
+def measure(func, repeat):
+    timings = []
+    for __ in range(repeat):
+        started_at = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает сериализацию каталога через stdlib json и через foodcartapp.rendering.dumps'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        catalog = get_catalog(options['products'])
+        candidates = [
+            # Так каталог отдавался раньше: JsonResponse с отступами
+            ('json, indent=4', lambda: json.dumps(catalog, cls=DjangoJSONEncoder, ensure_ascii=False, indent=4).encode()),
+            ('json, компактный', lambda: json.dumps(catalog, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()),
+            ('orjson, компактный', lambda: dumps(catalog)),
+            ('orjson, ?pretty=1', lambda: dumps(catalog, pretty=True)),
+        ]
+
+        self.stdout.write(f'{len(catalog)} товаров, лучший из {options["repeat"]} прогонов')
+        for title, func in candidates:
+            elapsed, payload = measure(func, options['repeat'])
+            self.stdout.write(f'{title}: {elapsed * 1000:.2f} мс, {len(payload) / 1024:.0f} КБ')
@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+
+from foodcartapp.models import PendingOrder, Product
+from foodcartapp.order_queue import process_pending_orders
+from foodcartapp.views import accept_order
+
+
+def get_order_data(products, number):
+    return {
+        'products': [{'product': product.id, 'quantity': 1} for product in products],
+        'firstname': 'Иван',
+        'lastname': 'Петров',
+        'phonenumber': f'+7999{number:07d}',
+        'address': 'Москва, Красная площадь, 1',
+    }
+
+
+def measure(func):
+    started_at = time.perf_counter()
+    func()
+    return time.perf_counter() - started_at
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает приём заказов сразу в базу и через очередь ORDER_INTAKE_QUEUE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--items', type=int, default=5, help='Сколько товаров в каждом заказе')
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        # Всё, что создаёт замер, откатывается в конце
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        products = Product.objects.bulk_create([
+            Product(name=f'Замер {number}', price=100)
+            for number in range(options['items'])
+        ])
+        orders = [get_order_data(products, number) for number in range(options['orders'])]
+
+        responses = []
+
+        def accept_all():
+            for order_data in orders:
+                response_data, __ = accept_order(order_data)
+                responses.append(response_data)
+
+        def drain_queue():
+            # Разбираем только свои заказы: настоящие в очереди не трогаем
+            # и не блокируем, и их время не попадает в замер
+            own_orders = PendingOrder.objects.filter(
+                reference__in=[response_data['reference'] for response_data in responses],
+            )
+            while any(process_pending_orders(options['batch_size'], own_orders)):
+                pass
+
+        self.stdout.write(f'{len(orders)} заказов по {len(products)} товаров')
+        with override_settings(ORDER_INTAKE_QUEUE=False):
+            direct_time = measure(accept_all)
+        responses.clear()
+        with override_settings(ORDER_INTAKE_QUEUE=True):
+            queue_time = measure(accept_all)
+        drain_time = measure(drain_queue)
+
+        for title, elapsed in [
+            ('сразу в базу', direct_time),
+            ('в очередь', queue_time),
+            (f'разбор очереди пачками по {options["batch_size"]}', drain_time),
+        ]:
+            self.stdout.write(f'{title}: {elapsed:.3f} с, {len(orders) / elapsed:.0f} заказов/с')
@@ -0,0 +1,65 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, filter_orders
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Выгружает заказы с позициями в CSV или NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from',
+            dest='registered_from',
+            type=date.fromisoformat,
+            help='Первый день выгрузки, ГГГГ-ММ-ДД',
+        )
+        parser.add_argument(
+            '--to',
+            dest='registered_to',
+            type=date.fromisoformat,
+            help='Последний день выгрузки включительно, ГГГГ-ММ-ДД',
+        )
+        parser.add_argument(
+            '--status',
+            dest='statuses',
+            action='append',
+            choices=[status for status, __ in Order.STATUS_CHOICES],
+            help='Статус заказа, можно указать несколько раз',
+        )
+        parser.add_argument(
+            '--format',
+            choices=EXPORT_FORMATS,
+            default='csv',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для выгрузки, по умолчанию stdout',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help='Сколько строк читать из базы за раз',
+        )
+
+    def handle(self, *args, **options):
+        orders = filter_orders(
+            Order.objects.all(),
+            options['registered_from'],
+            options['registered_to'],
+            options['statuses'],
+        )
+        iter_export, __ = EXPORT_FORMATS[options['format']]
+        lines = iter_export(orders, options['chunk_size'])
+
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line if isinstance(line, str) else line.decode(), ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for line in lines:
+                output.write(line if isinstance(line, str) else line.decode())
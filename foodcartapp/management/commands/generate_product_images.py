@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.catalog import bump_catalog_version
+from foodcartapp.images import generate_image_variants
+from foodcartapp.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии картинок товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать копии и у товаров, где они уже есть',
+        )
+
+    def handle(self, *args, **options):
+        products = []
+        for product in Product.objects.exclude(image=''):
+            if options['all'] or not product.has_actual_image_variants():
+                product.image_variants = generate_image_variants(product.image)
+                products.append(product)
+
+        Product.objects.bulk_update(products, ['image_variants'])
+        if products:
+            bump_catalog_version()
+        self.stdout.write(f'Обработано товаров: {len(products)}')
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Restaurant
+from geocoder_cache.utils import get_cached_coordinates_many
+
+
+class Command(BaseCommand):
+    help = 'Заполняет координаты ресторанов по их адресам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересчитать координаты и у ресторанов, где они уже заполнены',
+        )
+
+    def handle(self, *args, **options):
+        restaurants = Restaurant.objects.exclude(address='')
+        if not options['all']:
+            restaurants = restaurants.filter(lat__isnull=True) | restaurants.filter(lon__isnull=True)
+        restaurants = list(restaurants)
+
+        coordinates = get_cached_coordinates_many(
+            restaurant.address for restaurant in restaurants
+        )
+        for restaurant in restaurants:
+            restaurant.lat, restaurant.lon = coordinates.get(restaurant.address, (None, None))
+        Restaurant.objects.bulk_update(restaurants, ['lat', 'lon'])
+
+        located = sum(1 for restaurant in restaurants if restaurant.lat is not None)
+        self.stdout.write(
+            f'Обработано ресторанов: {len(restaurants)}, координаты найдены для {located}'
+        )
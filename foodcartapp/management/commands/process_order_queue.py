@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.order_queue import process_pending_orders
+
+
+class Command(BaseCommand):
+    help = 'Создаёт заказы, принятые в очередь при ORDER_INTAKE_QUEUE=True'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Сколько заказов создавать за одну транзакцию',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Разобрать очередь и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            created, failed = process_pending_orders(options['batch_size'])
+            if created:
+                self.stdout.write(f'Создано заказов: {created}')
+            if failed:
+                self.stderr.write(f'Не созданы, товары удалены из каталога: {failed}. Смотрите заказы в очереди в админке')
+            if created or failed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from foodcartapp.models import Order, Restaurant
+from geocoder_cache.models import CachedLocation
+from geocoder_cache.utils import fetch_and_cache_coordinates_many
+
+
+class Command(BaseCommand):
+    help = 'Заранее запрашивает координаты адресов ресторанов и заказов в работе'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Сколько адресов геокодировать за один проход',
+        )
+        parser.add_argument(
+            '--expiring-within',
+            type=int,
+            default=3,
+            help='Обновить координаты, которые устареют в ближайшие N дней',
+        )
+
+    def handle(self, *args, **options):
+        addresses = set(Restaurant.objects.exclude(address='').values_list('address', flat=True))
+        addresses |= set(
+            Order.objects
+            .filter(status__in=['unprocessed', 'underway'])
+            .values_list('address', flat=True)
+        )
+
+        known_addresses = set(
+            CachedLocation.objects
+            .filter(address__in=addresses)
+            .values_list('address', flat=True)
+        )
+        stale_addresses = set(
+            CachedLocation.objects
+            .needs_refresh(expiring_within_days=options['expiring_within'])
+            .values_list('address', flat=True)
+        )
+
+        addresses = sorted((addresses - known_addresses) | stale_addresses)
+        self.stdout.write(f'Адресов для геокодирования: {len(addresses)}')
+
+        batch_size = options['batch_size']
+        started_at = time.monotonic()
+        for start in range(0, len(addresses), batch_size):
+            fetch_and_cache_coordinates_many(addresses[start:start + batch_size])
+            self.stdout.write(f'Обработано {min(start + batch_size, len(addresses))} из {len(addresses)}')
+        elapsed = time.monotonic() - started_at
+
+        failures = dict(
+            CachedLocation.objects
+            .filter(address__in=addresses)
+            .exclude(failure_kind='')
+            .values_list('failure_kind')
+            .annotate(count=Count('id'))
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {elapsed:.1f} с ({len(addresses) / elapsed if elapsed else 0:.1f} адресов/с). '
+            f'Не найдено: {failures.get(CachedLocation.NOT_FOUND, 0)}, '
+            f'ошибок геокодера: {failures.get(CachedLocation.GEOCODER_ERROR, 0)}'
+        ))
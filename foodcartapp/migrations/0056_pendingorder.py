@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:48
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0055_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingOrder',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.UUIDField(default=uuid.uuid4, unique=True, verbose_name='номер обращения')),
+                ('payload', models.JSONField(verbose_name='данные заказа')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='дата и время регистрации')),
+            ],
+            options={
+                'verbose_name': 'заказ в очереди',
+                'verbose_name_plural': 'заказы в очереди',
+            },
+        ),
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(default=201, verbose_name='код ответа'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.db import migrations
+
+
+DEFAULT_BANNERS = [
+    ('Burger', 'burger.jpg', 'Tasty Burger at your door step'),
+    ('Spices', 'food.jpg', 'All Cuisines'),
+    ('New York', 'tasty.jpg', 'Food is incomplete without a tasty dessert'),
+]
+
+
+def load_default_banners(apps, schema_editor):
+    Banner = apps.get_model('foodcartapp', 'Banner')
+    if Banner.objects.exists():
+        return
+
+    for position, (title, filename, text) in enumerate(DEFAULT_BANNERS):
+        path = os.path.join(settings.BASE_DIR, 'assets', filename)
+        if not os.path.exists(path):
+            continue
+        banner = Banner(title=title, text=text, position=position)
+        # Миграции гоняются на каждой новой базе, в том числе в тестах,
+        # поэтому файл копируется, только если его ещё нет
+        storage = banner.image.storage
+        if not storage.exists(filename):
+            with open(path, 'rb') as image:
+                filename = storage.save(filename, File(image))
+        banner.image.name = filename
+        banner.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0057_banner'),
+    ]
+
+    operations = [
+        migrations.RunPython(load_default_banners, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:56
+
+from django.db import migrations, models
+
+
+ORDER_INDEXES = [
+    models.Index(fields=['payment_method', 'registered_at', 'id'], name='foodcartapp_payment_837b62_idx'),
+    models.Index(fields=['registered_at', 'id'], name='foodcartapp_registe_a63c12_idx'),
+]
+
+
+# В PostgreSQL индексы строятся с CONCURRENTLY, чтобы не блокировать запись
+# новых заказов на время построения. CONCURRENTLY нельзя выполнять в
+# транзакции, поэтому миграция не атомарная.
+def get_index_options(schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return {'concurrently': True}
+    return {}
+
+
+def add_order_indexes(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    for index in ORDER_INDEXES:
+        schema_editor.add_index(Order, index, **get_index_options(schema_editor))
+
+
+def remove_order_indexes(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    for index in ORDER_INDEXES:
+        schema_editor.remove_index(Order, index, **get_index_options(schema_editor))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('foodcartapp', '0059_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_order_indexes, remove_order_indexes),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name='order', index=index)
+                for index in ORDER_INDEXES
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+# Поиск по началу названия (istartswith) в PostgreSQL превращается в
+# UPPER("name"::text) LIKE UPPER('...%'). Обычный индекс для LIKE не
+# подходит, нужен индекс по тому же выражению с text_pattern_ops.
+PREFIX_INDEXES = [
+    ('foodcartapp_product_name_prefix_idx', 'foodcartapp_product', 'name'),
+    ('foodcartapp_restaurant_name_prefix_idx', 'foodcartapp_restaurant', 'name'),
+]
+
+
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index_name, table, column in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index_name} '
+            f'ON {table} (UPPER({column}::text) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index_name, table, column in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index_name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0060_order_changelist_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+
+# Поиск в админке и у менеджеров идёт через icontains, то есть
+# UPPER("поле"::text) LIKE UPPER('%...%'). Такой LIKE ускоряет только
+# триграммный GIN-индекс по тому же выражению.
+#
+# Индексы строятся с CONCURRENTLY, чтобы не блокировать запись новых заказов
+# на время построения. CONCURRENTLY нельзя выполнять в транзакции, поэтому
+# миграция не атомарная.
+TRIGRAM_INDEXES = [
+    ('foodcartapp_product_name_trgm_idx', 'foodcartapp_product', 'name'),
+    ('foodcartapp_productcategory_name_trgm_idx', 'foodcartapp_productcategory', 'name'),
+    ('foodcartapp_restaurant_name_trgm_idx', 'foodcartapp_restaurant', 'name'),
+    ('foodcartapp_restaurant_address_trgm_idx', 'foodcartapp_restaurant', 'address'),
+    ('foodcartapp_restaurant_contact_phone_trgm_idx', 'foodcartapp_restaurant', 'contact_phone'),
+    ('foodcartapp_order_lastname_trgm_idx', 'foodcartapp_order', 'lastname'),
+    ('foodcartapp_order_phonenumber_trgm_idx', 'foodcartapp_order', 'phonenumber'),
+    ('foodcartapp_order_address_trgm_idx', 'foodcartapp_order', 'address'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index_name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} '
+            f'ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index_name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index_name}')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('foodcartapp', '0061_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
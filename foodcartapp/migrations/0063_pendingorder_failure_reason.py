@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0062_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingorder',
+            name='failure_reason',
+            field=models.TextField(blank=True, verbose_name='почему заказ не создан'),
+        ),
+    ]
@@ -1,20 +1,60 @@
+import uuid
+
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from phonenumber_field.modelfields import PhoneNumberField
-from django.db.models import Sum, F
+from django.db.models import Count, F, OuterRef, Subquery, Sum
 from django.utils import timezone
 
+from .images import IMAGE_VARIANT_FORMATS, IMAGE_VARIANT_WIDTHS
+
 
 class CustomQueryset(models.QuerySet):
     def total_price(self):
-        price = self.annotate(
-            total_price=Sum(
-                F('order_items__price') * F('order_items__quantity')
-            )
+        # Подзапрос вместо JOIN + GROUP BY: count() по такому queryset
+        # не трогает позиции заказов
+        order_price = (
+            OrderItem.objects
+            .filter(order=OuterRef('pk'))
+            .values('order')
+            .annotate(total_price=Sum(F('price') * F('quantity')))
+            .values('total_price')
         )
+        price = self.annotate(total_price=Subquery(order_price))
         return price
 
 
+class RestaurantQuerySet(models.QuerySet):
+    def able_to_cook(self, orders):
+        """
+        Рестораны, в меню которых есть в продаже все продукты заказа.
+
+        Один запрос на любое число заказов: GROUP BY ресторан и заказ
+        HAVING число доступных продуктов = числу разных продуктов в заказе.
+        Ресторан попадает в выборку по разу на каждый подходящий заказ,
+        id заказа лежит в атрибуте order_id.
+        """
+        order_products_count = (
+            OrderItem.objects
+            .filter(order=OuterRef('order_id'))
+            .values('order')
+            .annotate(products_count=Count('product', distinct=True))
+            .values('products_count')
+        )
+        return (
+            self.filter(
+                menu_items__availability=True,
+                menu_items__product__order_items__order__in=orders,
+            )
+            .annotate(
+                order_id=F('menu_items__product__order_items__order'),
+                available_products_count=Count('menu_items__product', distinct=True),
+                order_products_count=Subquery(order_products_count),
+            )
+            .filter(available_products_count=F('order_products_count'))
+        )
+
+
 class Restaurant(models.Model):
     name = models.CharField(
         'название',
@@ -33,6 +73,8 @@ class Restaurant(models.Model):
     lat = models.FloatField(null=True, blank=True, verbose_name='Широта')
     lon = models.FloatField(null=True, blank=True, verbose_name='Долгота')
 
+    objects = RestaurantQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'ресторан'
         verbose_name_plural = 'рестораны'
@@ -41,6 +83,55 @@ class Restaurant(models.Model):
         return self.name
 
 
+class BannerQuerySet(models.QuerySet):
+    def active(self, moment=None):
+        moment = moment or timezone.now()
+        return self.filter(
+            models.Q(active_from__isnull=True) | models.Q(active_from__lte=moment),
+            models.Q(active_to__isnull=True) | models.Q(active_to__gt=moment),
+        )
+
+
+class Banner(models.Model):
+    title = models.CharField(
+        'заголовок',
+        max_length=50,
+    )
+    text = models.CharField(
+        'текст',
+        max_length=200,
+        blank=True,
+    )
+    image = models.ImageField(
+        'картинка',
+    )
+    position = models.PositiveIntegerField(
+        'порядок',
+        default=0,
+        db_index=True,
+    )
+    active_from = models.DateTimeField(
+        'показывать с',
+        null=True,
+        blank=True,
+    )
+    active_to = models.DateTimeField(
+        'показывать до',
+        null=True,
+        blank=True,
+    )
+
+    objects = BannerQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'баннер'
+        verbose_name_plural = 'баннеры'
+        ordering = ['position', 'id']
+
+    def __str__(self):
+        return self.title
+
+
 class ProductQuerySet(models.QuerySet):
     def available(self):
         products = (
@@ -87,6 +178,12 @@ class Product(models.Model):
     image = models.ImageField(
         'картинка'
     )
+    image_variants = models.JSONField(
+        'уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     special_status = models.BooleanField(
         'спец.предложение',
         default=False,
@@ -107,6 +204,40 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    def has_actual_image_variants(self):
+        # Раньше копии хранились словарём без настоящих ширин, такие создаём заново
+        return (
+            self.image_variants.get('source') == self.image.name
+            and isinstance(self.image_variants.get('variants'), list)
+        )
+
+    def get_image_variant_url(self, width, extension='jpeg'):
+        """Ссылка на самую узкую копию не уже width, а если копий нет — на оригинал"""
+        if not self.has_actual_image_variants():
+            return self.image.url
+        variants = self.image_variants['variants']
+        variant = next((variant for variant in variants if variant['width'] >= width), variants[-1])
+        return self.image.storage.url(variant[extension])
+
+    @property
+    def thumbnail_url(self):
+        return self.get_image_variant_url(IMAGE_VARIANT_WIDTHS[0])
+
+    @property
+    def thumbnail_srcset(self):
+        return self.get_image_srcset().get('jpeg', '')
+
+    def get_image_srcset(self):
+        """Значения атрибута srcset для каждого формата уменьшенных копий"""
+        if not self.has_actual_image_variants():
+            return {}
+        srcset = {}
+        for variant in self.image_variants['variants']:
+            for extension in IMAGE_VARIANT_FORMATS:
+                url = self.image.storage.url(variant[extension])
+                srcset.setdefault(extension, []).append(f'{url} {variant["width"]}w')
+        return {extension: ', '.join(sources) for extension, sources in srcset.items()}
+
 
 class RestaurantMenuItem(models.Model):
     restaurant = models.ForeignKey(
@@ -217,6 +348,11 @@ class Order(models.Model):
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
+        indexes = [
+            models.Index(fields=['status', 'registered_at', 'id']),
+            models.Index(fields=['payment_method', 'registered_at', 'id']),
+            models.Index(fields=['registered_at', 'id']),
+        ]
 
     def __str__(self):
         return f'Заказ от {self.firstname} {self.lastname}, по адресу: {self.address}'
@@ -249,3 +385,59 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f'{self.product.name} x {self.quantity}'
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField(
+        'ключ',
+        max_length=255,
+        unique=True,
+    )
+    request_hash = models.CharField(
+        'хэш запроса',
+        max_length=32,
+    )
+    response = models.JSONField(
+        'ответ',
+        null=True,
+    )
+    status_code = models.PositiveSmallIntegerField(
+        'код ответа',
+        default=201,
+    )
+    created_at = models.DateTimeField(
+        'дата создания',
+        default=timezone.now,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'ключ идемпотентности'
+        verbose_name_plural = 'ключи идемпотентности'
+
+    def __str__(self):
+        return self.key
+
+
+class PendingOrder(models.Model):
+    reference = models.UUIDField(
+        'номер обращения',
+        default=uuid.uuid4,
+        unique=True,
+    )
+    payload = models.JSONField('данные заказа')
+    created_at = models.DateTimeField(
+        'дата и время регистрации',
+        default=timezone.now,
+    )
+    failure_reason = models.TextField(
+        'почему заказ не создан',
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = 'заказ в очереди'
+        verbose_name_plural = 'заказы в очереди'
+
+    def __str__(self):
+        return str(self.reference)
@@ -0,0 +1,97 @@
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import Order, OrderItem, PendingOrder, Product
+
+
+def enqueue_order(validated_data):
+    """Сохраняет проверенный заказ в очередь, откуда его заберёт process_order_queue"""
+    return PendingOrder.objects.create(payload={
+        'firstname': validated_data['firstname'],
+        'lastname': validated_data['lastname'],
+        'phonenumber': validated_data['phonenumber'].as_e164,
+        'address': validated_data['address'],
+        'products': [
+            {
+                'product': product_data['product'].id,
+                'quantity': product_data['quantity'],
+                'price': str(product_data['product'].price),
+            }
+            for product_data in validated_data['products']
+        ],
+    })
+
+
+def process_pending_orders(batch_size, pending_orders=None):
+    """
+    Создаёт заказы из очереди пачкой и удаляет их из очереди.
+
+    pending_orders ограничивает, из каких заказов очереди брать пачку.
+
+    Цена товара берётся из очереди — та, что была на момент приёма заказа.
+    Если какой-то товар заказа успели удалить, заказ не создаётся: он
+    остаётся в очереди с причиной в failure_reason, чтобы менеджер
+    связался с клиентом. Возвращает количество созданных и отложенных
+    заказов.
+    """
+    with transaction.atomic():
+        if pending_orders is None:
+            pending_orders = PendingOrder.objects.all()
+        pending_orders = list(
+            pending_orders
+            .filter(failure_reason='')
+            .select_for_update(skip_locked=True)
+            .order_by('id')[:batch_size]
+        )
+        if not pending_orders:
+            return 0, 0
+
+        existing_product_ids = set(
+            Product.objects
+            .filter(id__in={
+                product_data['product']
+                for pending_order in pending_orders
+                for product_data in pending_order.payload['products']
+            })
+            .values_list('id', flat=True)
+        )
+        accepted_orders, failed_orders = [], []
+        for pending_order in pending_orders:
+            missing_product_ids = sorted(
+                product_data['product']
+                for product_data in pending_order.payload['products']
+                if product_data['product'] not in existing_product_ids
+            )
+            if missing_product_ids:
+                pending_order.failure_reason = (
+                    f'Товары удалены из каталога: {", ".join(map(str, missing_product_ids))}'
+                )
+                failed_orders.append(pending_order)
+            else:
+                accepted_orders.append(pending_order)
+        PendingOrder.objects.bulk_update(failed_orders, ['failure_reason'])
+
+        orders = Order.objects.bulk_create([
+            Order(
+                firstname=pending_order.payload['firstname'],
+                lastname=pending_order.payload['lastname'],
+                phonenumber=pending_order.payload['phonenumber'],
+                address=pending_order.payload['address'],
+                registered_at=pending_order.created_at,
+            )
+            for pending_order in accepted_orders
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product_id=product_data['product'],
+                quantity=product_data['quantity'],
+                price=Decimal(product_data['price']),
+            )
+            for order, pending_order in zip(orders, accepted_orders)
+            for product_data in pending_order.payload['products']
+        ])
+
+        PendingOrder.objects.filter(id__in=[pending_order.id for pending_order in accepted_orders]).delete()
+    return len(accepted_orders), len(failed_orders)
@@ -0,0 +1,39 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц, который не делает COUNT(*) по всей таблице.
+
+    Без фильтров число строк берётся из статистики PostgreSQL
+    (pg_class.reltuples), в остальных случаях строки считаются, но не
+    дальше count_limit.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimated_count = get_estimated_count(queryset)
+            if estimated_count is not None:
+                return estimated_count
+        return queryset.order_by().values('pk')[:self.count_limit].count()
+
+
+def get_estimated_count(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [connection.ops.quote_name(queryset.model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    # Таблица ещё ни разу не анализировалась — статистике верить нельзя
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+import orjson
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.functional import Promise
+from rest_framework.parsers import BaseParser
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import BaseRenderer
+
+
+_django_encoder = DjangoJSONEncoder()
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, Promise):
+        return str(value)
+    return _django_encoder.default(value)
+
+
+def dumps(data, pretty=False, sort_keys=False):
+    """
+    Сериализует data в компактный JSON (bytes).
+
+    Decimal превращается в строку без потери точности, как у JsonResponse.
+    """
+    option = 0
+    if pretty:
+        option |= orjson.OPT_INDENT_2
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(data, default=_default, option=option)
+
+
+def loads(payload):
+    return orjson.loads(payload)
+
+
+def is_pretty_requested(request):
+    return settings.DEBUG or request.GET.get('pretty') == '1'
+
+
+def prettify(payload):
+    return dumps(loads(payload), pretty=True)
+
+
+class JSONResponse(HttpResponse):
+    def __init__(self, data, pretty=False, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data, pretty=pretty), **kwargs)
+
+
+class FastJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        request = (renderer_context or {}).get('request')
+        return dumps(data, pretty=bool(request) and is_pretty_requested(request))
+
+
+class FastJSONParser(BaseParser):
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
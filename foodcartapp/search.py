@@ -0,0 +1,60 @@
+from functools import reduce
+from operator import and_, or_
+
+from django.db import connections
+from django.db.models import CharField, Func, Q
+
+
+class Casefold(Func):
+    """Приводит строку к нижнему регистру средствами Python, в том числе кириллицу"""
+    function = 'CASEFOLD'
+    output_field = CharField()
+
+
+def register_casefold(connection):
+    """
+    Регистрирует функцию CASEFOLD в SQLite.
+
+    Встроенные LIKE и LOWER в SQLite меняют регистр только у латиницы,
+    поэтому без неё поиск по-русски для локального запуска не работает.
+    """
+    connection.connection.create_function(
+        'CASEFOLD', 1,
+        lambda value: value.casefold() if value is not None else None,
+        deterministic=True,
+    )
+
+
+def search(queryset, fields, term):
+    """
+    Ищет каждое слово из term хотя бы в одном из полей fields без учёта регистра.
+
+    Поле с префиксом ^, как в search_fields админки, ищется по началу
+    значения. В PostgreSQL это icontains и istartswith, которые ускоряют
+    индексы по UPPER(поле) из миграций 0061 и 0062. В остальных базах поля
+    и слова сравниваются после CASEFOLD.
+    """
+    words = term.split()
+    if not words:
+        return queryset
+
+    lookups = {
+        field.lstrip('^'): 'startswith' if field.startswith('^') else 'contains'
+        for field in fields
+    }
+    if connections[queryset.db].vendor == 'postgresql':
+        conditions = [
+            reduce(or_, (Q(**{f'{field}__i{lookup}': word}) for field, lookup in lookups.items()))
+            for word in words
+        ]
+        return queryset.filter(reduce(and_, conditions))
+
+    aliases = {f'{field}_casefold': Casefold(field) for field in lookups}
+    conditions = [
+        reduce(or_, (
+            Q(**{f'{field}_casefold__{lookup}': word.casefold()})
+            for field, lookup in lookups.items()
+        ))
+        for word in words
+    ]
+    return queryset.alias(**aliases).filter(reduce(and_, conditions))
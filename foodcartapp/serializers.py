@@ -1,14 +1,12 @@
 from rest_framework import serializers
+from .catalog import CATALOG_FIELDS
 from .models import Order, OrderItem, Product
 from django.core.validators import MinValueValidator, MaxValueValidator
 from phonenumber_field.serializerfields import PhoneNumberField
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product = serializers.PrimaryKeyRelatedField(
-        queryset=Product.objects.all(),
-        error_messages={'does_not_exist': 'Продукт с этим id не найден'}
-    )
+    product = serializers.IntegerField()
     quantity = serializers.IntegerField(
         validators=[
             MinValueValidator(1, message='Количество должно быть не менее 1'),
@@ -33,16 +31,35 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ['firstname', 'lastname', 'phonenumber', 'address', 'products']
         read_only_fields = ['id']
 
+    def validate_products(self, products_data):
+        products = Product.objects.in_bulk(
+            {product_data['product'] for product_data in products_data}
+        )
+        errors = [
+            {} if product_data['product'] in products
+            else {'product': ['Продукт с этим id не найден']}
+            for product_data in products_data
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        for product_data in products_data:
+            product_data['product'] = products[product_data['product']]
+        return products_data
+
     def create(self, validated_data):
         products_data = validated_data.pop('products')
         order = Order.objects.create(**validated_data)
 
-        for product_data in products_data:
-            OrderItem.objects.create(
+        OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
                 product=product_data['product'],
-                quantity=product_data['quantity']
+                quantity=product_data['quantity'],
+                price=product_data['product'].price,
             )
+            for product_data in products_data
+        ])
         return order
 
 
@@ -50,3 +67,20 @@ class OrderResponseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ['id', 'firstname', 'lastname', 'phonenumber', 'address']
+
+
+class ProductListQuerySerializer(serializers.Serializer):
+    category = serializers.IntegerField(required=False, min_value=1)
+    special = serializers.BooleanField(required=False)
+    fields = serializers.CharField(required=False)
+    cursor = serializers.IntegerField(required=False, min_value=0)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=100)
+
+    def validate_fields(self, value):
+        fields = [field.strip() for field in value.split(',') if field.strip()]
+        unknown_fields = set(fields) - set(CATALOG_FIELDS)
+        if unknown_fields:
+            raise serializers.ValidationError(
+                f'Неизвестные поля: {", ".join(sorted(unknown_fields))}'
+            )
+        return fields
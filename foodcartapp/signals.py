@@ -0,0 +1,26 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .banners import invalidate_banners
+from .catalog import bump_catalog_version
+from .models import Banner, Product, ProductCategory, RestaurantMenuItem
+from .search import register_casefold
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductCategory)
+@receiver([post_save, post_delete], sender=RestaurantMenuItem)
+def reset_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver([post_save, post_delete], sender=Banner)
+def reset_banners(sender, **kwargs):
+    invalidate_banners()
+
+
+@receiver(connection_created)
+def add_search_functions(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        register_casefold(connection)
@@ -0,0 +1,364 @@
+import gzip
+import tempfile
+import time
+from datetime import timedelta
+from importlib.util import find_spec
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from star_burger.compression import CompressionMiddleware
+
+from .admin import OrderAdminForm
+from .checks import check_shared_cache
+from .images import generate_image_variants
+from .models import Banner, Order, OrderItem, PendingOrder, Product, Restaurant, RestaurantMenuItem
+from .order_queue import process_pending_orders
+from .search import search
+from .throttling import (
+    IN_FLIGHT_BUCKET_SECONDS,
+    IN_FLIGHT_WINDOW_BUCKETS,
+    LoadSheddingMiddleware,
+    consume_token,
+    get_client_ip,
+    get_in_flight_key,
+)
+
+
+class RestaurantAbleToCookTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(name=f'Бургер {number}', price=100)
+            for number in range(15)
+        ]
+        cls.full_menu_restaurant = Restaurant.objects.create(name='Полное меню')
+        cls.partial_menu_restaurant = Restaurant.objects.create(name='Без первого бургера')
+        cls.stop_list_restaurant = Restaurant.objects.create(name='Первый бургер в стоп-листе')
+        RestaurantMenuItem.objects.bulk_create(
+            [
+                RestaurantMenuItem(restaurant=cls.full_menu_restaurant, product=product)
+                for product in cls.products
+            ] + [
+                RestaurantMenuItem(restaurant=cls.partial_menu_restaurant, product=product)
+                for product in cls.products[1:]
+            ] + [
+                RestaurantMenuItem(
+                    restaurant=cls.stop_list_restaurant,
+                    product=product,
+                    availability=product != cls.products[0],
+                )
+                for product in cls.products
+            ]
+        )
+
+    def create_order(self, products):
+        order = Order.objects.create(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79991234567',
+            address='Москва, Красная площадь, 1',
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=product.price)
+            for product in products
+        ])
+        return order
+
+    def test_restaurant_needs_every_product_available(self):
+        small_order = self.create_order(self.products[1:3])
+        large_order = self.create_order(self.products)
+
+        suitable_restaurants = {}
+        for restaurant in Restaurant.objects.able_to_cook([small_order.id, large_order.id]):
+            suitable_restaurants.setdefault(restaurant.order_id, set()).add(restaurant)
+
+        self.assertEqual(suitable_restaurants[small_order.id], {
+            self.full_menu_restaurant,
+            self.partial_menu_restaurant,
+            self.stop_list_restaurant,
+        })
+        self.assertEqual(suitable_restaurants[large_order.id], {self.full_menu_restaurant})
+
+    def test_repeated_products_are_counted_once(self):
+        order = self.create_order([self.products[1], self.products[1], self.products[2]])
+        restaurants = set(Restaurant.objects.able_to_cook([order.id]))
+        self.assertIn(self.partial_menu_restaurant, restaurants)
+
+    def test_query_count_does_not_depend_on_orders(self):
+        orders = [self.create_order(self.products[:size]) for size in (1, 5, 15)]
+        for order_ids in ([orders[0].id], [order.id for order in orders]):
+            with self.assertNumQueries(1):
+                list(Restaurant.objects.able_to_cook(order_ids))
+
+    def test_admin_form_query_count_does_not_depend_on_order_size(self):
+        for size in (1, 15):
+            order = self.create_order(self.products[:size])
+            with self.assertNumQueries(1):
+                str(OrderAdminForm(instance=order)['cooking_restaurant'])
+
+
+class RegisterOrderTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(name=f'Бургер {number}', price=100 + number)
+            for number in range(15)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def post_order(self, products, phonenumber='+79991234567', **headers):
+        return self.client.post('/api/order/', {
+            'products': [{'product': product.id, 'quantity': 2} for product in products],
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': phonenumber,
+            'address': 'Москва, Красная площадь, 1',
+        }, content_type='application/json', headers=headers)
+
+    def test_query_count_does_not_depend_on_order_size(self):
+        with CaptureQueriesContext(connection) as single_item_queries:
+            response = self.post_order(self.products[:1])
+        self.assertEqual(response.status_code, 201)
+
+        with self.assertNumQueries(len(single_item_queries)):
+            response = self.post_order(self.products)
+        self.assertEqual(response.status_code, 201)
+
+        order = Order.objects.get(id=response.json()['id'])
+        self.assertEqual(
+            sorted(order.order_items.values_list('product_id', 'quantity', 'price')),
+            [(product.id, 2, product.price) for product in self.products],
+        )
+
+    def test_unknown_product_is_rejected(self):
+        response = self.post_order([self.products[0], Product(id=10 ** 6)])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    @override_settings(ORDER_RATE_LIMIT_BURST=1)
+    def test_phone_throttle_compares_normalized_numbers(self):
+        self.assertEqual(self.post_order(self.products[:1]).status_code, 201)
+        response = self.post_order(self.products[:1], phonenumber='8 (999) 123-45-67')
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(ORDER_RATE_LIMIT_BURST=1)
+    def test_replay_is_served_despite_phone_throttle(self):
+        response = self.post_order(self.products[:1], idempotency_key='order-1')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.post_order(self.products[:2]).status_code, 429)
+
+        replay = self.post_order(self.products[:1], idempotency_key='order-1')
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay.json(), response.json())
+        self.assertEqual(Order.objects.count(), 1)
+
+
+@override_settings(ORDER_INTAKE_QUEUE=True)
+class OrderQueueTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = [
+            Product.objects.create(name=f'Бургер {number}', price=100)
+            for number in range(4)
+        ]
+
+    def post_order(self, products):
+        return self.client.post('/api/order/', {
+            'products': [{'product': product.id, 'quantity': 1} for product in products],
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79991234567',
+            'address': 'Москва, Красная площадь, 1',
+        }, content_type='application/json')
+
+    def test_order_with_deleted_product_stays_in_queue(self):
+        self.assertEqual(self.post_order(self.products[:2]).status_code, 202)
+        self.assertEqual(self.post_order(self.products[2:]).status_code, 202)
+        deleted_product_id = self.products[0].id
+        self.products[0].delete()
+
+        self.assertEqual(process_pending_orders(batch_size=10), (1, 1))
+        self.assertEqual(process_pending_orders(batch_size=10), (0, 0))
+
+        order = Order.objects.get()
+        self.assertEqual(
+            set(order.order_items.values_list('product_id', flat=True)),
+            {self.products[2].id, self.products[3].id},
+        )
+        pending_order = PendingOrder.objects.get()
+        self.assertIn(str(deleted_product_id), pending_order.failure_reason)
+
+
+class BannersApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_only_active_banners_are_listed(self):
+        now = timezone.now()
+        Banner.objects.create(title='Всегда', image='always.png')
+        Banner.objects.create(title='Закончился', image='past.png', active_to=now - timedelta(days=1))
+        Banner.objects.create(title='Скоро', image='future.png', active_from=now + timedelta(days=1))
+
+        response = self.client.get('/api/banners/')
+        titles = [banner['title'] for banner in response.json()]
+        self.assertIn('Всегда', titles)
+        self.assertNotIn('Закончился', titles)
+        self.assertNotIn('Скоро', titles)
+        self.assertNotIn('Last-Modified', response)
+
+        response = self.client.get('/api/banners/', headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+
+class ThrottlingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_requests_over_capacity_wait_for_next_window(self):
+        for __ in range(3):
+            self.assertEqual(consume_token('test', capacity=3, refill_per_minute=1), 0)
+        retry_after = consume_token('test', capacity=3, refill_per_minute=1)
+        self.assertGreater(retry_after, 0)
+        self.assertLessEqual(retry_after, 3 * 60)
+
+    @override_settings(MAX_REQUESTS_IN_FLIGHT=10, STAFF_RESERVED_REQUESTS=2)
+    def test_leaked_in_flight_slots_expire(self):
+        middleware = LoadSheddingMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().get('/api/products/')
+        started_at = time.time()
+
+        with mock.patch('time.time', return_value=started_at):
+            # Воркеры, убитые посреди запроса, не вычли себя из счётчика
+            bucket = int(started_at // IN_FLIGHT_BUCKET_SECONDS)
+            cache.set(get_in_flight_key(bucket), 8)
+            self.assertEqual(middleware(request).status_code, 503)
+            self.assertEqual(middleware(RequestFactory().get('/manager/')).status_code, 200)
+
+        later = started_at + IN_FLIGHT_BUCKET_SECONDS * IN_FLIGHT_WINDOW_BUCKETS
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(middleware(request).status_code, 200)
+
+    def test_api_is_not_limited_per_ip_without_client_ip_header(self):
+        with override_settings(API_RATE_LIMIT_BURST=1, API_RATE_LIMIT_PER_MINUTE=1):
+            for __ in range(3):
+                self.assertEqual(self.client.get('/api/banners/').status_code, 200)
+            with override_settings(CLIENT_IP_META_KEY='HTTP_X_REAL_IP'):
+                self.assertEqual(self.client.get('/api/banners/').status_code, 200)
+                self.assertEqual(self.client.get('/api/banners/').status_code, 429)
+
+    @override_settings(CLIENT_IP_META_KEY='HTTP_X_FORWARDED_FOR')
+    def test_client_ip_is_the_one_added_by_proxy(self):
+        request = RequestFactory().get('/', headers={'x-forwarded-for': '1.1.1.1, 203.0.113.7'})
+        self.assertEqual(get_client_ip(request), '203.0.113.7')
+
+
+class ImageVariantsTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_product(self, width, height):
+        buffer = BytesIO()
+        Image.new('RGB', (width, height), 'red').save(buffer, 'PNG')
+        product = Product(name='Бургер', price=100)
+        product.image.save('burger.png', ContentFile(buffer.getvalue()))
+        product.image_variants = generate_image_variants(product.image)
+        product.save()
+        return product
+
+    def test_srcset_uses_real_widths_without_upscaling(self):
+        product = self.create_product(300, 200)
+
+        self.assertEqual([variant['width'] for variant in product.image_variants['variants']], [64, 256, 300])
+        srcset = product.get_image_srcset()
+        self.assertRegex(srcset['jpeg'], r'^\S+ 64w, \S+ 256w, \S+ 300w$')
+        self.assertRegex(srcset['webp'], r'^\S+ 64w, \S+ 256w, \S+ 300w$')
+        self.assertIn('.300w.', product.get_image_variant_url(768))
+
+    def test_wide_image_is_not_kept_in_original_size(self):
+        for width in (768, 1000):
+            product = self.create_product(width, 500)
+            self.assertEqual([variant['width'] for variant in product.image_variants['variants']], [64, 256, 768])
+
+    def test_small_image_keeps_its_width(self):
+        product = self.create_product(40, 40)
+
+        self.assertEqual([variant['width'] for variant in product.image_variants['variants']], [40])
+        self.assertTrue(product.thumbnail_srcset.endswith(' 40w'))
+
+    def test_old_variants_are_outdated(self):
+        product = Product(name='Бургер', price=100, image='burger.png', image_variants={
+            'source': 'burger.png',
+            'variants': {'64': {'jpeg': 'burger.64w.jpeg', 'webp': 'burger.64w.webp'}},
+        })
+        self.assertFalse(product.has_actual_image_variants())
+        self.assertEqual(product.thumbnail_url, product.image.url)
+
+
+class CompressionMiddlewareTest(TestCase):
+    def get_response(self, content_type):
+        content = b'<input name="csrfmiddlewaretoken" value="secret">' * 100
+        middleware = CompressionMiddleware(lambda request: HttpResponse(content, content_type=content_type))
+        request = RequestFactory().get('/', headers={'accept-encoding': 'gzip, br'})
+        return content, middleware(request)
+
+    def test_json_is_compressed_with_brotli(self):
+        __, response = self.get_response('application/json')
+        self.assertEqual(response['Content-Encoding'], 'br')
+
+    def test_html_is_gzipped_with_random_padding(self):
+        content, response = self.get_response('text/html; charset=utf-8')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), content)
+
+        sizes = {len(self.get_response('text/html; charset=utf-8')[1].content) for __ in range(10)}
+        self.assertGreater(len(sizes), 1)
+
+
+class SharedCacheCheckTest(TestCase):
+    def test_local_memory_cache_fails_in_production(self):
+        with override_settings(DEBUG=False):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['foodcartapp.E001'])
+        with override_settings(DEBUG=False, CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'},
+        }):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class PostgresSearchTest(TestCase):
+    def search_on_postgresql(self, queryset, fields, term):
+        with mock.patch('foodcartapp.search.connections', {'default': SimpleNamespace(vendor='postgresql')}):
+            return search(queryset, fields, term)
+
+    @skipUnless(find_spec('psycopg2'), 'нужен psycopg2')
+    def test_sql_matches_upper_indexes(self):
+        from django.db.backends.postgresql.base import DatabaseWrapper
+
+        postgresql = DatabaseWrapper({**connection.settings_dict, 'ENGINE': 'django.db.backends.postgresql'})
+        queryset = self.search_on_postgresql(Order.objects.all(), ['lastname', 'address'], 'Иван')
+        sql, params = queryset.query.get_compiler(connection=postgresql).as_sql()
+        # Выражения те же, что в индексах миграций 0061 и 0062
+        self.assertIn('UPPER("foodcartapp_order"."lastname"::text) LIKE UPPER(%s)', sql)
+        self.assertIn('UPPER("foodcartapp_order"."address"::text) LIKE UPPER(%s)', sql)
+        self.assertIn('%Иван%', params)
+
+        queryset = self.search_on_postgresql(Product.objects.all(), ['^name'], 'Бург')
+        sql, params = queryset.query.get_compiler(connection=postgresql).as_sql()
+        self.assertIn('UPPER("foodcartapp_product"."name"::text) LIKE UPPER(%s)', sql)
+        self.assertIn('Бург%', params)
@@ -0,0 +1,154 @@
+import time
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from phonenumber_field.phonenumber import PhoneNumber
+from phonenumbers import NumberParseException
+from rest_framework.throttling import BaseThrottle
+
+from .rendering import JSONResponse
+
+
+# Запросы в работе считаются по корзинам времени: запрос прибавляет себя к
+# корзине, в которую начался, и вычитает из неё же. Если воркер убили и
+# вычесть не получилось, место освободится, когда корзина выйдет из окна
+IN_FLIGHT_BUCKET_SECONDS = 10
+IN_FLIGHT_WINDOW_BUCKETS = 6
+
+
+def consume_token(key, capacity, refill_per_minute):
+    """
+    Засчитывает запрос в счётчик key в общем кэше.
+
+    Время делится на окна по capacity / refill_per_minute минут, и в
+    каждом окне разрешено не больше capacity запросов. Счётчик
+    увеличивается атомарно через cache.add и cache.incr. Возвращает,
+    сколько секунд ждать до следующего окна, или 0, если запрос разрешён.
+    """
+    window = capacity * 60 / refill_per_minute
+    now = time.time()
+    window_number = int(now // window)
+    cache_key = f'throttling:window:{md5(key.encode()).hexdigest()}:{window_number}'
+
+    cache.add(cache_key, 0, int(window) + 1)
+    try:
+        requests_count = cache.incr(cache_key)
+    except ValueError:
+        # Счётчик вытеснили из кэша между add и incr
+        return 0
+    if requests_count > capacity:
+        return (window_number + 1) * window - now
+    return 0
+
+
+def get_client_ip(request):
+    """
+    Берёт IP клиента из CLIENT_IP_META_KEY, а если заголовка нет — из REMOTE_ADDR.
+
+    В X-Forwarded-For адреса левее последнего присылает сам клиент, и им
+    нельзя верить, поэтому берётся последний — его дописал наш прокси.
+    """
+    ip = request.META.get(settings.CLIENT_IP_META_KEY) or request.META.get('REMOTE_ADDR', '')
+    return ip.split(',')[-1].strip()
+
+
+def get_in_flight_key(bucket):
+    return f'throttling:in_flight:{bucket}'
+
+
+def is_staff_path(path):
+    return path.startswith(('/manager/', '/admin/'))
+
+
+def too_many_requests(retry_after, status=429, detail='Слишком много запросов, попробуйте позже'):
+    response = JSONResponse({'detail': detail}, status=status)
+    response['Retry-After'] = str(max(1, round(retry_after)))
+    return response
+
+
+class ApiRateLimitMiddleware:
+    """Ограничивает частоту запросов к /api/ с одного IP, если задан CLIENT_IP_META_KEY"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Без CLIENT_IP_META_KEY за nginx у всех клиентов один IP — 127.0.0.1,
+        # и лимит стал бы общим на весь сайт
+        if settings.CLIENT_IP_META_KEY and request.path.startswith('/api/'):
+            retry_after = consume_token(
+                f'ip:{get_client_ip(request)}',
+                settings.API_RATE_LIMIT_BURST,
+                settings.API_RATE_LIMIT_PER_MINUTE,
+            )
+            if retry_after:
+                return too_many_requests(retry_after)
+        return self.get_response(request)
+
+
+class LoadSheddingMiddleware:
+    """
+    Отвечает 503, когда сайт обрабатывает слишком много запросов сразу.
+
+    Счётчик запросов в работе общий для всех процессов. Запрос, который
+    идёт дольше минуты, перестаёт учитываться. Последние
+    STAFF_RESERVED_REQUESTS мест достаются только менеджерам и админке.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.MAX_REQUESTS_IN_FLIGHT:
+            return self.get_response(request)
+
+        limit = settings.MAX_REQUESTS_IN_FLIGHT
+        if not is_staff_path(request.path):
+            limit -= settings.STAFF_RESERVED_REQUESTS
+
+        bucket = int(time.time() // IN_FLIGHT_BUCKET_SECONDS)
+        bucket_key = get_in_flight_key(bucket)
+        cache.add(bucket_key, 0, IN_FLIGHT_BUCKET_SECONDS * (IN_FLIGHT_WINDOW_BUCKETS + 1))
+        try:
+            cache.incr(bucket_key)
+        except ValueError:
+            return self.get_response(request)
+        in_flight = sum(cache.get_many([
+            get_in_flight_key(bucket - number)
+            for number in range(IN_FLIGHT_WINDOW_BUCKETS)
+        ]).values())
+
+        try:
+            if in_flight > limit:
+                return too_many_requests(1, status=503, detail='Сервер перегружен, попробуйте позже')
+            return self.get_response(request)
+        finally:
+            try:
+                cache.decr(bucket_key)
+            except ValueError:
+                pass
+
+
+class PhoneNumberThrottle(BaseThrottle):
+    """Ограничивает частоту заказов на один номер телефона"""
+
+    def allow_request(self, request, view):
+        phonenumber = request.data.get('phonenumber') if hasattr(request.data, 'get') else None
+        if not isinstance(phonenumber, str):
+            return True
+        # Один номер можно записать по-разному: 8 999..., +7 (999) ...
+        try:
+            phonenumber = PhoneNumber.from_string(phonenumber, region='RU')
+        except NumberParseException:
+            # Такой заказ всё равно не пройдёт проверку сериализатора
+            return True
+        self.retry_after = consume_token(
+            f'phonenumber:{phonenumber.as_e164}',
+            settings.ORDER_RATE_LIMIT_BURST,
+            settings.ORDER_RATE_LIMIT_PER_MINUTE,
+        )
+        return not self.retry_after
+
+    def wait(self):
+        return self.retry_after
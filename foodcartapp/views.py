@@ -1,72 +1,145 @@
-from django.http import JsonResponse
-from django.templatetags.static import static
+from datetime import timedelta
+from hashlib import md5
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import Throttled
 from rest_framework import status
 from django.db import transaction
+from django.utils import timezone
 
-from .serializers import OrderSerializer, OrderResponseSerializer
-from .models import Product
+from .banners import get_banners_payload
+from .bootstrap import get_bootstrap_json
+from .catalog import get_catalog_payload, get_catalog_version, get_variant_key
+from .models import IdempotencyKey
+from .order_queue import enqueue_order
+from .rendering import JSONResponse, dumps, is_pretty_requested, prettify
+from .serializers import OrderSerializer, OrderResponseSerializer, ProductListQuerySerializer
+from .throttling import PhoneNumberThrottle
 
 
-def banners_list_api(request):
-    # FIXME move data to db?
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
-        {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
-        }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
+def start_page(request):
+    response = render(request, 'index.html', context={
+        'bootstrap_json': get_bootstrap_json(),
     })
+    # Каталог встроен в страницу, поэтому браузер должен перепроверять её
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@condition(etag_func=lambda request: get_banners_payload()[1])
+def banners_list_api(request):
+    payload, __ = get_banners_payload()
+    if is_pretty_requested(request):
+        payload = prettify(payload)
+    response = HttpResponse(payload, content_type='application/json')
+    patch_cache_control(response, public=True, max_age=settings.BANNERS_MAX_AGE)
+    return response
 
 
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    query_serializer = ProductListQuerySerializer(data=request.GET.dict())
+    if not query_serializer.is_valid():
+        return JSONResponse(query_serializer.errors, status=400)
+    params = query_serializer.validated_data
 
+    version = get_catalog_version()
+    etag = quote_etag(f'{version}-{get_variant_key(params)}')
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        payload = get_catalog_payload(version, params)
+        if is_pretty_requested(request):
+            payload = prettify(payload)
+        response = HttpResponse(payload, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
 
-@api_view(['POST'])
-def register_order(request):
-    serializer = OrderSerializer(data=request.data)
 
+def get_request_hash(data):
+    return md5(dumps(data, sort_keys=True)).hexdigest()
+
+
+def accept_order(data):
+    """
+    Проверяет и принимает заказ. Возвращает тело ответа и его код.
+
+    При ORDER_INTAKE_QUEUE заказ кладётся в очередь, и клиент получает
+    202 с номером обращения вместо номера заказа.
+    """
+    serializer = OrderSerializer(data=data)
     serializer.is_valid(raise_exception=True)
+
+    if settings.ORDER_INTAKE_QUEUE:
+        pending_order = enqueue_order(serializer.validated_data)
+        return {'reference': str(pending_order.reference)}, status.HTTP_202_ACCEPTED
+
     with transaction.atomic():
         order = serializer.save()
     response_serializer = OrderResponseSerializer(order)
-    return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+    return response_serializer.data, status.HTTP_201_CREATED
+
+
+def check_order_throttle(request):
+    throttle = PhoneNumberThrottle()
+    if not throttle.allow_request(request, None):
+        raise Throttled(wait=throttle.wait())
+
+
+def replay_response(stored_request, request_hash):
+    if stored_request.request_hash != request_hash:
+        return Response(
+            {'detail': 'Idempotency-Key уже использован для другого заказа'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(stored_request.response, status=stored_request.status_code)
+
+
+@api_view(['POST'])
+def register_order(request):
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key is None:
+        check_order_throttle(request)
+        response_data, status_code = accept_order(request.data)
+        return Response(response_data, status=status_code)
+
+    if not idempotency_key or len(idempotency_key) > 255:
+        return Response(
+            {'detail': 'Некорректный заголовок Idempotency-Key'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    request_hash = get_request_hash(request.data)
+    valid_since = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    # Повтор уже принятого заказа отдаём до лимита заказов на телефон:
+    # клиент, не дождавшийся ответа, должен получить свой заказ, а не 429
+    stored_request = IdempotencyKey.objects.filter(key=idempotency_key, created_at__gte=valid_since).first()
+    if stored_request is not None:
+        return replay_response(stored_request, request_hash)
+
+    check_order_throttle(request)
+    with transaction.atomic():
+        # Повторы с тем же ключом ждут здесь, пока первый запрос не завершится
+        stored_request, created = (
+            IdempotencyKey.objects
+            .select_for_update()
+            .get_or_create(key=idempotency_key, defaults={'request_hash': request_hash})
+        )
+        if not created and stored_request.created_at >= valid_since:
+            return replay_response(stored_request, request_hash)
+
+        response_data, status_code = accept_order(request.data)
+
+        stored_request.request_hash = request_hash
+        stored_request.response = response_data
+        stored_request.status_code = status_code
+        stored_request.created_at = timezone.now()
+        stored_request.save()
+
+    return Response(response_data, status=status_code)
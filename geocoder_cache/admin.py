@@ -3,7 +3,7 @@ from .models import CachedLocation
 
 @admin.register(CachedLocation)
 class CachedLocationAdmin(admin.ModelAdmin):
-    list_display = ['address', 'latitude', 'longitude', 'updated_at']
-    list_filter = ['updated_at']
+    list_display = ['address', 'latitude', 'longitude', 'failure_kind', 'next_retry_at', 'updated_at']
+    list_filter = ['failure_kind', 'updated_at']
     search_fields = ['address']
     readonly_fields = ['created_at', 'updated_at']
\ No newline at end of file
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:45
+
+from django.db import migrations, models
+
+
+def mark_empty_locations_for_retry(apps, schema_editor):
+    CachedLocation = apps.get_model('geocoder_cache', 'CachedLocation')
+    CachedLocation.objects.filter(latitude__isnull=True).update(failure_kind='error')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocoder_cache', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cachedlocation',
+            name='failed_attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='неудачных попыток подряд'),
+        ),
+        migrations.AddField(
+            model_name='cachedlocation',
+            name='failure_kind',
+            field=models.CharField(blank=True, choices=[('', 'нет'), ('not_found', 'адрес не найден'), ('error', 'ошибка геокодера')], default='', max_length=20, verbose_name='ошибка геокодирования'),
+        ),
+        migrations.AddField(
+            model_name='cachedlocation',
+            name='next_retry_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='следующая попытка'),
+        ),
+        migrations.RunPython(mark_empty_locations_for_retry, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,37 @@
+from datetime import timedelta
+
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 
 
+class CachedLocationQuerySet(models.QuerySet):
+    def needs_refresh(self, expiring_within_days=0):
+        """
+        Адреса, которые пора снова запросить у геокодера.
+
+        Как CachedLocation.needs_refresh, но в SQL. С expiring_within_days
+        сюда попадают и координаты, которые устареют в ближайшие дни.
+        """
+        now = timezone.now()
+        expired_before = now - timedelta(days=CachedLocation.EXPIRY_DAYS - expiring_within_days)
+        return self.filter(
+            Q(failure_kind=CachedLocation.GEOCODER_ERROR)
+            & (Q(next_retry_at__isnull=True) | Q(next_retry_at__lte=now))
+            | ~Q(failure_kind=CachedLocation.GEOCODER_ERROR)
+            & Q(updated_at__lt=expired_before)
+        )
+
+
 class CachedLocation(models.Model):
+    EXPIRY_DAYS = 30
+    NOT_FOUND = 'not_found'
+    GEOCODER_ERROR = 'error'
+    FAILURE_CHOICES = [
+        ('', 'нет'),
+        (NOT_FOUND, 'адрес не найден'),
+        (GEOCODER_ERROR, 'ошибка геокодера'),
+    ]
     address = models.CharField(
         'адрес',
         max_length=255,
@@ -11,9 +40,20 @@ class CachedLocation(models.Model):
     )
     latitude = models.FloatField('широта', null=True, blank=True)
     longitude = models.FloatField('долгота', null=True, blank=True)
+    failure_kind = models.CharField(
+        'ошибка геокодирования',
+        max_length=20,
+        choices=FAILURE_CHOICES,
+        default='',
+        blank=True,
+    )
+    failed_attempts = models.PositiveIntegerField('неудачных попыток подряд', default=0)
+    next_retry_at = models.DateTimeField('следующая попытка', null=True, blank=True)
     created_at = models.DateTimeField('дата создания', auto_now_add=True)
     updated_at = models.DateTimeField('дата обновления', auto_now=True)
 
+    objects = CachedLocationQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'кэшированная локация'
         verbose_name_plural = 'кэшированные локации'
@@ -24,6 +64,12 @@ class CachedLocation(models.Model):
     def __str__(self):
         return f'{self.address} ({self.latitude}, {self.longitude})'
 
-    def is_expired(self, expiry_days=30):
+    def is_expired(self):
         """Проверяет, устарели ли данные"""
-        return (timezone.now() - self.updated_at).days > expiry_days
+        return self.updated_at < timezone.now() - timedelta(days=self.EXPIRY_DAYS)
+
+    def needs_refresh(self):
+        """Проверяет, пора ли снова запросить координаты у геокодера"""
+        if self.failure_kind == self.GEOCODER_ERROR:
+            return self.next_retry_at is None or self.next_retry_at <= timezone.now()
+        return self.is_expired()
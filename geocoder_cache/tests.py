@@ -1,3 +1,201 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import CachedLocation
+from .utils import fetch_and_cache_coordinates_many, get_cached_coordinates_many, local_cache
+
+
+STUB_DELAY = 0.2
+
+
+class StubGeocoderHandler(BaseHTTPRequestHandler):
+    """
+    Отвечает как API Яндекс Геокодера.
+
+    Адрес со словом nowhere не находится, со словом fail — отвечает 503,
+    остальные находятся в точке 37.6 55.7.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        address = parse_qs(urlparse(self.path).query)['geocode'][0]
+        server = self.server
+        with server.lock:
+            server.requested_addresses.append(address)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(STUB_DELAY)
+            if 'fail' in address:
+                self.send_response(503)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            found_places = [] if 'nowhere' in address else [
+                {'GeoObject': {'Point': {'pos': '37.6 55.7'}}},
+            ]
+            body = json.dumps({
+                'response': {'GeoObjectCollection': {'featureMember': found_places}},
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+class GeocoderTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubGeocoderHandler)
+        cls.server.lock = threading.Lock()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.settings_override = override_settings(
+            YANDEX_GEOCODER_URL=f'http://127.0.0.1:{cls.server.server_port}/1.x',
+            GEOCODER_MAX_WORKERS=5,
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requested_addresses = []
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        local_cache.clear()
+        cache.clear()
+
+    def test_misses_are_fetched_concurrently(self):
+        addresses = [f'Москва, Тверская, {number}' for number in range(5)]
+
+        started_at = time.perf_counter()
+        coordinates = get_cached_coordinates_many(addresses)
+        elapsed = time.perf_counter() - started_at
+
+        self.assertEqual(coordinates, {address: (55.7, 37.6) for address in addresses})
+        self.assertCountEqual(self.server.requested_addresses, addresses)
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLess(elapsed, STUB_DELAY * len(addresses))
+
+    def test_results_are_saved_with_one_upsert(self):
+        CachedLocation.objects.create(address='Москва, Арбат, 1', latitude=1, longitude=1)
+        addresses = ['Москва, Арбат, 1', 'Москва, Арбат, 2', 'Москва, Арбат, 3']
+
+        with CaptureQueriesContext(connection) as queries:
+            fetch_and_cache_coordinates_many(addresses)
+
+        writes = [query['sql'] for query in queries if not query['sql'].startswith('SELECT')]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('ON CONFLICT', writes[0])
+        self.assertEqual(
+            set(CachedLocation.objects.values_list('address', 'latitude', 'longitude')),
+            {(address, 55.7, 37.6) for address in addresses},
+        )
+
+    def test_not_found_address_is_cached(self):
+        address = 'nowhere, 1'
+
+        self.assertEqual(get_cached_coordinates_many([address]), {address: (None, None)})
+        location = CachedLocation.objects.get(address=address)
+        self.assertEqual(location.failure_kind, CachedLocation.NOT_FOUND)
+
+        local_cache.clear()
+        cache.clear()
+        self.assertEqual(get_cached_coordinates_many([address]), {address: (None, None)})
+        self.assertEqual(self.server.requested_addresses, [address])
+
+    def test_server_error_backs_off(self):
+        address = 'fail, 1'
+        CachedLocation.objects.create(
+            address=address,
+            latitude=55.0,
+            longitude=37.0,
+            failure_kind=CachedLocation.GEOCODER_ERROR,
+            next_retry_at=timezone.now(),
+        )
+
+        with self.assertLogs('geocoder_cache.utils', 'WARNING'):
+            coordinates = get_cached_coordinates_many([address])
+
+        # Пока геокодер недоступен, остаются прежние координаты
+        self.assertEqual(coordinates, {address: (55.0, 37.0)})
+        location = CachedLocation.objects.get(address=address)
+        self.assertEqual(location.failed_attempts, 1)
+        self.assertAlmostEqual(
+            location.next_retry_at - timezone.now(), timedelta(minutes=1), delta=timedelta(seconds=10),
+        )
+
+        get_cached_coordinates_many([address])
+        self.assertEqual(self.server.requested_addresses, [address])
+
+        CachedLocation.objects.filter(address=address).update(next_retry_at=timezone.now())
+        with self.assertLogs('geocoder_cache.utils', 'WARNING'):
+            get_cached_coordinates_many([address])
+        location = CachedLocation.objects.get(address=address)
+        self.assertEqual(self.server.requested_addresses, [address, address])
+        self.assertEqual(location.failed_attempts, 2)
+        self.assertAlmostEqual(
+            location.next_retry_at - timezone.now(), timedelta(minutes=2), delta=timedelta(seconds=10),
+        )
+
+    def test_server_error_for_new_address_is_stored(self):
+        with self.assertLogs('geocoder_cache.utils', 'WARNING'):
+            coordinates = fetch_and_cache_coordinates_many(['fail, 2', 'Москва, Арбат, 4'])
+
+        self.assertEqual(coordinates, {'fail, 2': (None, None), 'Москва, Арбат, 4': (55.7, 37.6)})
+        location = CachedLocation.objects.get(address='fail, 2')
+        self.assertEqual(location.failure_kind, CachedLocation.GEOCODER_ERROR)
+        self.assertEqual(location.failed_attempts, 1)
+
+
+class NeedsRefreshTest(TestCase):
+    def test_queryset_matches_instance_check(self):
+        now = timezone.now()
+        rows = {
+            'свежий': {'updated_days_ago': 1},
+            'устаревший': {'updated_days_ago': 31},
+            'скоро устареет': {'updated_days_ago': 28},
+            'не найден давно': {'updated_days_ago': 31, 'failure_kind': CachedLocation.NOT_FOUND},
+            'ошибка, ждём': {'failure_kind': CachedLocation.GEOCODER_ERROR, 'next_retry_at': now + timedelta(hours=1)},
+            'ошибка, пора': {'failure_kind': CachedLocation.GEOCODER_ERROR, 'next_retry_at': now - timedelta(hours=1)},
+        }
+        for address, fields in rows.items():
+            updated_days_ago = fields.pop('updated_days_ago', 0)
+            location = CachedLocation.objects.create(address=address, **fields)
+            CachedLocation.objects.filter(pk=location.pk).update(
+                updated_at=now - timedelta(days=updated_days_ago),
+            )
+
+        stale = set(CachedLocation.objects.needs_refresh().values_list('address', flat=True))
+        self.assertEqual(stale, {
+            location.address
+            for location in CachedLocation.objects.all()
+            if location.needs_refresh()
+        })
+        self.assertEqual(stale, {'устаревший', 'не найден давно', 'ошибка, пора'})
+
+        expiring = set(CachedLocation.objects.needs_refresh(expiring_within_days=3).values_list('address', flat=True))
+        self.assertEqual(expiring, stale | {'скоро устареет'})
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from .views import cache_stats
+
+
+app_name = "geocoder_cache"
+
+urlpatterns = [
+    path('stats/', cache_stats, name='cache_stats'),
+]
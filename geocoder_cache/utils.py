@@ -1,64 +1,245 @@
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from hashlib import md5
+
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 from django.core.cache import cache
+from django.utils import timezone
+from .lru import LRUCache
 from .models import CachedLocation
 
 
+logger = logging.getLogger(__name__)
+
+local_cache = LRUCache(
+    maxsize=settings.GEOCODER_LOCAL_CACHE_SIZE,
+    ttl=settings.GEOCODER_LOCAL_CACHE_TIMEOUT,
+)
+cache_stats = Counter()
+
+RETRY_BACKOFF_BASE = timedelta(minutes=1)
+RETRY_BACKOFF_MAX = timedelta(days=1)
+
+session = requests.Session()
+session.mount('https://', HTTPAdapter(pool_maxsize=settings.GEOCODER_MAX_WORKERS))
+session.mount('http://', HTTPAdapter(pool_maxsize=settings.GEOCODER_MAX_WORKERS))
+
+
 def get_cached_coordinates(address):
     """
     Получает координаты из кэша или API
     """
     if not address:
         return None, None
+    return get_cached_coordinates_many([address])[address]
 
-    try:
-        location = CachedLocation.objects.get(address=address)
-        if not location.is_expired():
-            return location.latitude, location.longitude
-    except CachedLocation.DoesNotExist:
-        pass
 
-    return fetch_and_cache_coordinates(address)
+def get_cached_coordinates_many(addresses):
+    """
+    Получает координаты для нескольких адресов.
+
+    Адреса ищутся по очереди в кэше процесса, в общем кэше Django и в
+    таблице CachedLocation; найденное на нижнем уровне копируется на
+    верхние. Оставшиеся адреса запрашиваются у API параллельно.
+    Возвращает словарь {адрес: (lat, lon)}.
+    """
+    addresses = {address for address in addresses if address}
+    if not addresses:
+        return {}
+
+    coordinates = {}
+    for address in addresses:
+        location = local_cache.get(address)
+        if location is not None:
+            coordinates[address] = location
+    _count_lookups('local', len(addresses), len(coordinates))
+
+    missing = addresses - coordinates.keys()
+    if missing:
+        shared_cached = cache.get_many([get_cache_key(address) for address in missing])
+        for address in missing:
+            location = shared_cached.get(get_cache_key(address))
+            if location is not None:
+                coordinates[address] = location
+                local_cache.set(address, location)
+        _count_lookups('shared', len(missing), len(shared_cached))
+
+    missing = addresses - coordinates.keys()
+    if missing:
+        stored = {}
+        backing_off = {}
+        for location in CachedLocation.objects.filter(address__in=missing):
+            if location.needs_refresh():
+                continue
+            if location.failure_kind == CachedLocation.GEOCODER_ERROR:
+                backing_off[location.address] = (location.latitude, location.longitude)
+            else:
+                stored[location.address] = (location.latitude, location.longitude)
+        _count_lookups('db', len(missing), len(stored) + len(backing_off))
+        _fill_caches(stored)
+        coordinates.update(stored)
+        coordinates.update(backing_off)
+
+    coordinates.update(
+        fetch_and_cache_coordinates_many(addresses - coordinates.keys())
+    )
+    return coordinates
+
+
+def get_cache_key(address):
+    return f'geocode:{md5(address.encode()).hexdigest()}'
+
+
+def get_cache_stats():
+    """
+    Возвращает счётчики попаданий и промахов по уровням кэша в текущем процессе
+    """
+    return {
+        'local_size': len(local_cache),
+        **cache_stats,
+    }
+
+
+def _count_lookups(tier, total, hits):
+    cache_stats[f'{tier}_hits'] += hits
+    cache_stats[f'{tier}_misses'] += total - hits
+
+
+def _fill_caches(coordinates):
+    for address, location in coordinates.items():
+        local_cache.set(address, location)
+    cache.set_many({
+        get_cache_key(address): location
+        for address, location in coordinates.items()
+    }, settings.GEOCODER_CACHE_TIMEOUT)
+
+
+def fetch_coordinates(address):
+    """
+    Запрашивает координаты у API геокодера
+    """
+    response = session.get(settings.YANDEX_GEOCODER_URL, params={
+        "geocode": address,
+        "apikey": settings.YANDEX_API_KEY,
+        "format": "json",
+    }, timeout=5)
+    response.raise_for_status()
+
+    found_places = response.json()['response']['GeoObjectCollection']['featureMember']
+    if not found_places:
+        return None, None
+
+    most_relevant = found_places[0]
+    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+    return float(lat), float(lon)
 
 
 def fetch_and_cache_coordinates(address):
     """
     Запрашивает координаты у API и сохраняет в кэш
     """
+    return fetch_and_cache_coordinates_many([address])[address]
+
+
+def get_retry_delay(failed_attempts):
+    """
+    Время до следующей попытки: удваивается с каждой неудачей подряд
+    """
+    delay = RETRY_BACKOFF_BASE * 2 ** min(failed_attempts - 1, 20)
+    return min(delay, RETRY_BACKOFF_MAX)
+
+
+def _fetch_coordinates_safe(address):
     try:
-        base_url = "https://geocode-maps.yandex.ru/1.x"
-        response = requests.get(base_url, params={
-            "geocode": address,
-            "apikey": settings.YANDEX_API_KEY,
-            "format": "json",
-        }, timeout=5)
-        response.raise_for_status()
+        lat, lon = fetch_coordinates(address)
+    except (requests.RequestException, KeyError, ValueError) as e:
+        logger.warning('Geocoding error for %s: %s', address, e)
+        return CachedLocation.GEOCODER_ERROR, (None, None)
+    if lat is None:
+        return CachedLocation.NOT_FOUND, (None, None)
+    return '', (lat, lon)
 
-        found_places = response.json()['response']['GeoObjectCollection']['featureMember']
-        if not found_places:
-            return None, None
 
-        most_relevant = found_places[0]
-        lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
-        lat = float(lat)
-        lon = float(lon)
+def fetch_and_cache_coordinates_many(addresses):
+    """
+    Параллельно запрашивает координаты у API и сохраняет их в кэш одним запросом.
 
-        CachedLocation.objects.update_or_create(
-            address=address,
-            defaults={'latitude': lat, 'longitude': lon}
-        )
+    Если адрес не найден, это запоминается как обычный ответ. При ошибке
+    сети или геокодера следующая попытка откладывается, а пока остаются
+    прежние координаты, если они были.
+    """
+    addresses = list(dict.fromkeys(addresses))
+    if not addresses:
+        return {}
 
-        cache_key = f'geocode_{address}'
-        cache.set(cache_key, (lat, lon), 3600)
+    with ThreadPoolExecutor(max_workers=min(settings.GEOCODER_MAX_WORKERS, len(addresses))) as executor:
+        results = dict(zip(addresses, executor.map(_fetch_coordinates_safe, addresses)))
 
-        return lat, lon
+    coordinates = {
+        address: location
+        for address, (failure_kind, location) in results.items()
+        if failure_kind != CachedLocation.GEOCODER_ERROR
+    }
+    CachedLocation.objects.bulk_create(
+        [
+            CachedLocation(
+                address=address,
+                latitude=lat,
+                longitude=lon,
+                failure_kind=results[address][0],
+            )
+            for address, (lat, lon) in coordinates.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['address'],
+        update_fields=[
+            'latitude',
+            'longitude',
+            'failure_kind',
+            'failed_attempts',
+            'next_retry_at',
+            'updated_at',
+        ],
+    )
+    _fill_caches(coordinates)
 
-    except (requests.RequestException, KeyError, ValueError) as e:
-        print(f'Geocoding error for {address}: {str(e)}')
+    failed_addresses = [
+        address
+        for address, (failure_kind, location) in results.items()
+        if failure_kind == CachedLocation.GEOCODER_ERROR
+    ]
+    if failed_addresses:
+        coordinates.update(_register_failures(failed_addresses))
 
-        CachedLocation.objects.get_or_create(
-            address=address,
-            defaults={'latitude': None, 'longitude': None}
-        )
+    return coordinates
 
-        return None, None
+
+def _register_failures(addresses):
+    stored_locations = CachedLocation.objects.in_bulk(addresses, field_name='address')
+    new_locations = [
+        CachedLocation(address=address)
+        for address in addresses
+        if address not in stored_locations
+    ]
+    locations = [*stored_locations.values(), *new_locations]
+
+    retry_from = timezone.now()
+    for location in locations:
+        location.failure_kind = CachedLocation.GEOCODER_ERROR
+        location.failed_attempts += 1
+        location.next_retry_at = retry_from + get_retry_delay(location.failed_attempts)
+
+    CachedLocation.objects.bulk_update(
+        stored_locations.values(),
+        ['failure_kind', 'failed_attempts', 'next_retry_at'],
+    )
+    CachedLocation.objects.bulk_create(new_locations, ignore_conflicts=True)
+
+    return {
+        location.address: (location.latitude, location.longitude)
+        for location in locations
+    }
@@ -1,3 +1,10 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
 
-# Create your views here.
+from foodcartapp.rendering import JSONResponse, is_pretty_requested
+
+from .utils import get_cache_stats
+
+
+@staff_member_required
+def cache_stats(request):
+    return JSONResponse(get_cache_stats(), pretty=is_pretty_requested(request))
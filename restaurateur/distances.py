@@ -0,0 +1,64 @@
+from math import radians, sin, cos, asin, sqrt
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _prepare_points(points):
+    prepared = []
+    for point in points:
+        if not point or point[0] is None or point[1] is None:
+            prepared.append(None)
+            continue
+        lat, lon = radians(point[0]), radians(point[1])
+        prepared.append((lat, lon, cos(lat)))
+    return prepared
+
+
+def calculate_distance_matrix(origins, destinations):
+    """
+    Считает расстояния в км между каждой парой точек origins × destinations.
+
+    Точки передаются как (lat, lon); если координаты неизвестны, вместо
+    расстояния в матрице будет None. Тригонометрия по каждой точке
+    считается один раз, а не для каждой пары.
+    """
+    prepared_origins = _prepare_points(origins)
+    prepared_destinations = _prepare_points(destinations)
+
+    matrix = []
+    for origin in prepared_origins:
+        if origin is None:
+            matrix.append([None] * len(prepared_destinations))
+            continue
+        origin_lat, origin_lon, origin_cos = origin
+        row = []
+        for destination in prepared_destinations:
+            if destination is None:
+                row.append(None)
+                continue
+            dest_lat, dest_lon, dest_cos = destination
+            haversine = (
+                sin((dest_lat - origin_lat) / 2) ** 2
+                + origin_cos * dest_cos * sin((dest_lon - origin_lon) / 2) ** 2
+            )
+            row.append(2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(haversine))))
+        matrix.append(row)
+    return matrix
+
+
+def get_nearest(distances, indexes=None, limit=None):
+    """
+    Возвращает пары (индекс, расстояние), отсортированные по возрастанию расстояния.
+
+    Точки с неизвестным расстоянием идут в конце списка.
+    """
+    if indexes is None:
+        indexes = range(len(distances))
+    nearest = sorted(
+        ((index, distances[index]) for index in indexes),
+        key=lambda pair: (pair[1] is None, pair[1] or 0),
+    )
+    if limit is not None:
+        nearest = nearest[:limit]
+    return nearest
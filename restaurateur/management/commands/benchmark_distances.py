@@ -0,0 +1,66 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from restaurateur.distances import calculate_distance_matrix, get_nearest
+
+
+# Окрестности Москвы: все точки в пределах ~50 км друг от друга
+CENTER = (55.75, 37.62)
+SPREAD = 0.4
+
+
+def get_random_points(count, rng):
+    return [
+        (CENTER[0] + rng.uniform(-SPREAD, SPREAD), CENTER[1] + rng.uniform(-SPREAD, SPREAD))
+        for __ in range(count)
+    ]
+
+
+def measure(func, repeat):
+    timings = []
+    for __ in range(repeat):
+        started_at = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает матрицу расстояний с попарным расчётом через geopy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=50)
+        parser.add_argument('--restaurants', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        orders = get_random_points(options['orders'], rng)
+        restaurants = get_random_points(options['restaurants'], rng)
+
+        def matrix():
+            for distances in calculate_distance_matrix(orders, restaurants):
+                get_nearest(distances)
+
+        self.stdout.write(
+            f'{len(orders)} заказов × {len(restaurants)} ресторанов, лучший из {options["repeat"]} прогонов'
+        )
+        matrix_time = measure(matrix, options['repeat'])
+        self.stdout.write(f'матрица: {matrix_time:.4f} с')
+
+        try:
+            from geopy import distance
+        except ImportError:
+            self.stdout.write('geopy не установлен, сравнение пропущено: pip install geopy')
+            return
+
+        # Так расстояния считались раньше: geopy.distance.distance для каждой пары
+        def geopy_loop():
+            for order in orders:
+                sorted(distance.distance(order, restaurant).km for restaurant in restaurants)
+
+        geopy_time = measure(geopy_loop, options['repeat'])
+        self.stdout.write(f'geopy по парам: {geopy_time:.4f} с (в {geopy_time / matrix_time:.0f} раз медленнее)')
@@ -1,18 +1,30 @@
+from datetime import datetime, time, timedelta
+
 from django import forms
 from django.shortcuts import redirect, render
 from django.views import View
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.contrib.auth.decorators import user_passes_test
 from django.conf import settings
+from django.http import QueryDict
+from django.db.models import Q
+from django.utils.timezone import make_aware
 
-from geopy import distance
-import requests
-from geocoder_cache.utils import get_cached_coordinates
+from geocoder_cache.utils import get_cached_coordinates_many
 
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 
-from foodcartapp.models import Product, Restaurant, Order, RestaurantMenuItem
+from foodcartapp.models import Product, Restaurant, Order
+from foodcartapp.rendering import JSONResponse, is_pretty_requested
+from foodcartapp.search import search
+
+from .distances import calculate_distance_matrix, get_nearest
+
+
+ORDERS_PER_PAGE = 50
+ORDER_SEARCH_LIMIT = 20
+ORDER_SEARCH_FIELDS = ['lastname', 'phonenumber', 'address']
 
 
 class Login(forms.Form):
@@ -32,6 +44,41 @@ class Login(forms.Form):
     )
 
 
+class OrderFilterForm(forms.Form):
+    status = forms.ChoiceField(
+        label='Статус', required=False,
+        choices=[('', 'Все')] + Order.STATUS_CHOICES,
+    )
+    payment_method = forms.ChoiceField(
+        label='Способ оплаты', required=False,
+        choices=[('', 'Все')] + Order.PAYMENT_CHOICES,
+    )
+    cooking_restaurant = forms.ModelChoiceField(
+        label='Ресторан', required=False,
+        queryset=Restaurant.objects.order_by('name'),
+        empty_label='Все',
+    )
+    registered_from = forms.DateField(
+        label='Зарегистрирован с', required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+    )
+    registered_to = forms.DateField(
+        label='по', required=False,
+        widget=forms.DateInput(attrs={'type': 'date'}),
+    )
+    after = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def clean_after(self):
+        after = self.cleaned_data['after']
+        if not after:
+            return None
+        try:
+            registered_at, order_id = after.rsplit(',', 1)
+            return datetime.fromisoformat(registered_at), int(order_id)
+        except ValueError:
+            raise forms.ValidationError('Некорректная ссылка на страницу')
+
+
 class LoginView(View):
     def get(self, request, *args, **kwargs):
         form = Login()
@@ -96,66 +143,110 @@ def view_restaurants(request):
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
-    orders = Order.objects.total_price().filter(status='unprocessed').prefetch_related(
-        'order_items__product__menu_items__restaurant'
+    filter_form = OrderFilterForm(request.GET or QueryDict('status=unprocessed'))
+    filter_form.is_valid()
+    filters = filter_form.cleaned_data
+
+    orders = Order.objects.order_by('registered_at', 'id')
+    if filters.get('status'):
+        orders = orders.filter(status=filters['status'])
+    if filters.get('payment_method'):
+        orders = orders.filter(payment_method=filters['payment_method'])
+    if filters.get('cooking_restaurant'):
+        orders = orders.filter(cooking_restaurant=filters['cooking_restaurant'])
+    if filters.get('registered_from'):
+        orders = orders.filter(
+            registered_at__gte=make_aware(datetime.combine(filters['registered_from'], time.min))
+        )
+    if filters.get('registered_to'):
+        orders = orders.filter(
+            registered_at__lt=make_aware(datetime.combine(filters['registered_to'] + timedelta(days=1), time.min))
+        )
+    if filters.get('after'):
+        registered_at, order_id = filters['after']
+        orders = orders.filter(
+            Q(registered_at__gt=registered_at)
+            | Q(registered_at=registered_at, id__gt=order_id)
+        )
+
+    orders = list(
+        orders.total_price()
+        .select_related('cooking_restaurant')[:ORDERS_PER_PAGE + 1]
     )
+    next_page_url = None
+    if len(orders) > ORDERS_PER_PAGE:
+        orders = orders[:ORDERS_PER_PAGE]
+        last_order = orders[-1]
+        next_page_params = filter_form.data.copy()
+        next_page_params['after'] = f'{last_order.registered_at.isoformat()},{last_order.id}'
+        next_page_url = f'?{next_page_params.urlencode()}'
+
+    restaurants = []
+    restaurant_indexes = {}
+    suitable_restaurant_indexes = {}
+    for restaurant in Restaurant.objects.able_to_cook([order.id for order in orders]):
+        if restaurant.id not in restaurant_indexes:
+            restaurant_indexes[restaurant.id] = len(restaurants)
+            restaurants.append(restaurant)
+        suitable_restaurant_indexes.setdefault(restaurant.order_id, []).append(
+            restaurant_indexes[restaurant.id]
+        )
 
-    menu_items = RestaurantMenuItem.objects.filter(availability=True).select_related('restaurant', 'product')
-
-    product_restaurants = {}
-    for item in menu_items:
-        if item.product_id not in product_restaurants:
-            product_restaurants[item.product_id] = []
-        product_restaurants[item.product_id].append(item.restaurant)
-
-    orders_with_restaurants = []
-    for order in orders:
-        suitable_restaurants = set()
-        first_product = True
-
-        for order_item in order.order_items.all():
-            product = order_item.product
-            if product.id in product_restaurants:
-                if first_product:
-                    suitable_restaurants = set(product_restaurants[product.id])
-                    first_product = False
-                else:
-                    suitable_restaurants &= set(product_restaurants[product.id])
-            else:
-                suitable_restaurants = set()
-                break
-
-        order_lat, order_lon = get_cached_coordinates(order.address)
-        order_coords = (order_lat, order_lon) if order_lat and order_lon else None
-
-        restaurants_with_distances = []
-        for restaurant in suitable_restaurants:
-            rest_lat, rest_lon = get_cached_coordinates(restaurant.address)
-            if order_coords and rest_lat and rest_lon:
-                try:
-                    rest_order_distance = distance.distance(
-                        order_coords,
-                        (rest_lat, rest_lon)
-                    ).km
-                    distance_km = f'{round(rest_order_distance, 2)} км'
-                except ValueError:
-                    distance_km = 'Ошибка расчета расстояния'
-            else:
-                distance_km = 'Ошибка определения координат'
-
-            restaurants_with_distances.append({
-                'restaurant': restaurant,
-                'distance': distance_km
-            })
-
-        restaurants_with_distances.sort(key=lambda x:
-            x['distance'] if isinstance(x['distance'], (int, float)) else float('inf'))
-
-        orders_with_restaurants.append({
-            'order': order,
-            'suitable_restaurants': restaurants_with_distances,
-        })
+    orders_with_restaurants = [{'order': order} for order in orders]
+    order_coordinates = get_cached_coordinates_many(
+        item['order'].address for item in orders_with_restaurants
+    )
+    distance_matrix = calculate_distance_matrix(
+        [order_coordinates.get(item['order'].address) for item in orders_with_restaurants],
+        [(restaurant.lat, restaurant.lon) for restaurant in restaurants],
+    )
 
+    for item, distances in zip(orders_with_restaurants, distance_matrix):
+        nearest = get_nearest(
+            distances,
+            indexes=suitable_restaurant_indexes.get(item['order'].id, []),
+            limit=settings.NEAREST_RESTAURANTS_LIMIT,
+        )
+        item['suitable_restaurants'] = [
+            {
+                'restaurant': restaurants[index],
+                'distance': distance,
+            }
+            for index, distance in nearest
+        ]
+
+    first_page_params = filter_form.data.copy()
+    first_page_params.pop('after', None)
     return render(request, template_name='order_items.html', context={
-        'order_items': orders_with_restaurants
+        'order_items': orders_with_restaurants,
+        'filter_form': filter_form,
+        'first_page_url': f'?{first_page_params.urlencode()}',
+        'next_page_url': next_page_url,
     })
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def search_orders(request):
+    """Последние заказы, у которых фамилия, телефон или адрес содержат слова из ?q="""
+    term = request.GET.get('q', '')
+    orders = (
+        search(Order.objects.all(), ORDER_SEARCH_FIELDS, term)
+        .total_price()
+        .order_by('-registered_at', '-id')[:ORDER_SEARCH_LIMIT]
+    ) if term.strip() else []
+    results = [
+        {
+            'id': order.id,
+            'status': order.get_status_display(),
+            'payment_method': order.get_payment_method_display(),
+            'registered_at': order.registered_at,
+            'firstname': order.firstname,
+            'lastname': order.lastname,
+            'phonenumber': str(order.phonenumber),
+            'address': order.address,
+            'total_price': order.total_price,
+            'admin_url': reverse('admin:foodcartapp_order_change', args=(order.id,)),
+        }
+        for order in orders
+    ]
+    return JSONResponse({'results': results}, pretty=is_pretty_requested(request))
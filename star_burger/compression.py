@@ -0,0 +1,151 @@
+import gzip
+import os
+
+import brotli
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+
+COMPRESSIBLE_CONTENT_TYPES = (
+    'application/json',
+    'application/javascript',
+    'text/javascript',
+    'text/css',
+    'image/svg+xml',
+)
+# В страницах есть CSRF-токены, поэтому их сжимаем только gzip со
+# случайной добавкой, как GZipMiddleware, чтобы усложнить атаку BREACH
+PADDED_CONTENT_TYPES = (
+    'text/',
+)
+COMPRESSIBLE_EXTENSIONS = (
+    '.css',
+    '.js',
+    '.map',
+    '.json',
+    '.svg',
+    '.txt',
+    '.html',
+    '.xml',
+    '.ttf',
+    '.eot',
+)
+MIN_STATIC_SIZE = 256
+
+
+def get_accepted_encodings(accept_encoding):
+    encodings = set()
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        if name and quality > 0:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def compress_content(content, encoding, padded=False):
+    if encoding == 'br':
+        return brotli.compress(content, quality=5)
+    if padded:
+        return compress_string(content, max_random_bytes=GZipMiddleware.max_random_bytes)
+    return gzip.compress(content, compresslevel=6)
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы больше RESPONSE_COMPRESSION_MIN_SIZE байт.
+
+    JSON и прочие данные без секретов сжимаются brotli, если клиент его
+    понимает, иначе gzip. HTML — только gzip со случайной добавкой.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < settings.RESPONSE_COMPRESSION_MIN_SIZE:
+            return response
+        content_type = response.get('Content-Type', '')
+        if content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+            padded = False
+        elif content_type.startswith(PADDED_CONTENT_TYPES):
+            padded = True
+        else:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted_encodings = get_accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if 'br' in accepted_encodings and not padded:
+            encoding = 'br'
+        elif 'gzip' in accepted_encodings:
+            encoding = 'gzip'
+        else:
+            return response
+
+        compressed_content = compress_content(response.content, encoding, padded)
+        if len(compressed_content) >= len(response.content):
+            return response
+
+        response.content = compressed_content
+        response['Content-Length'] = str(len(compressed_content))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+        return response
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Статика с хэшем содержимого в именах и готовыми .gz и .br рядом.
+
+    nginx отдаёт сжатые копии через gzip_static и brotli_static, а
+    файлы с хэшем в имени можно кэшировать навсегда.
+    """
+
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.add(hashed_name)
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+
+        for hashed_name in sorted(hashed_names):
+            if hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress_file(hashed_name)
+
+    def compress_file(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as file:
+            content = file.read()
+        if len(content) < MIN_STATIC_SIZE:
+            return
+
+        compressed_files = {
+            '.gz': gzip.compress(content, compresslevel=9, mtime=0),
+            '.br': brotli.compress(content),
+        }
+        for extension, compressed_content in compressed_files.items():
+            if len(compressed_content) < len(content):
+                with open(path + extension, 'wb') as file:
+                    file.write(compressed_content)
+            elif os.path.exists(path + extension):
+                os.remove(path + extension)